@@ -8,7 +8,8 @@ docsdir=$( pwd )
 realdocsdir=$( realpath "$docsdir" )
 
 usage="$0 --help
-$0 --sphinx [--installpypkgs] [--copyxml devdir]"
+$0 --sphinx [--installpypkgs] [--copyxml devdir] [--changed-since ref] [--checklinks]
+$0 --watch [--copyxml devdir]"
 help="Usage:
 $usage
 
@@ -20,10 +21,19 @@ Builds the documentation webpages for casadocs.
                  \"~/dev/CAS-6692/src/casa6/casatools/xml/*.xml\" and \"~/dev/CAS-6692/src/casa6/casatasks/xml/*.xml\"
 --tools          List of tools to include, separated by commas. All other tools will be excluded. 'none' for no tools. Eg:
                  --tools logsink,regionmanager
---tasks          Like tools, but for tasks. Must include the category of the task name. Eg:
-                 --tasks analysis.imfit,imaging.tclean
+--tasks          Like tools, but for tasks. Must include the category of the task name, or * for any category. Eg:
+                 --tasks analysis.imfit,imaging.tclean,*.bandpass
 --notebooks      Like tools, but for notebooks. Eg:
                  --notebooks image_visualization
+--changed-since  Pick the tools, tasks and notebooks from what changed since the given git ref (committed
+                 or not, including xml copied with --copyxml), plus the pages that link to them. Eg:
+                 --changed-since origin/master
+                 --tools, --tasks and --notebooks still override the pick for their group.
+--watch          Build, then serve the pages on http://localhost:8000/ and rebuild only what changed as the
+                 notebooks, api pages, task/tool descriptions and xml (from the --copyxml devdir too) are edited.
+                 Open pages reload by themselves after each rebuild. Stop with ctrl-c.
+--checklinks     List the internal links and anchors (in the notebooks, api pages and task/tool descriptions) that
+                 don't lead anywhere, before building. Takes a second or so and doesn't go online.
 --nobel          Don't 'tput bel' at the end of a successful execution.
 --installpypkgs  Installs any missing python pip packages.
 "
@@ -35,6 +45,8 @@ Builds the documentation webpages for casadocs.
 #############################################################################################################
 
 sphinx=0
+watch=0
+checklinks=0
 installpypkgs=0
 copyxml=0
 copyxmldevdir=""
@@ -44,6 +56,7 @@ tasks=0
 tasksnames=""
 notebooks=0
 notebooksnames=""
+changedsince=""
 tmpnobel=""
 while test $# -gt 0
 do
@@ -59,6 +72,10 @@ do
             ;;
         --sphinx) sphinx=1
             ;;
+        --watch) watch=1
+            ;;
+        --checklinks) checklinks=1
+            ;;
         --installpypkgs) installpypkgs=1
             ;;
         --copyxml) copyxml=1
@@ -106,6 +123,16 @@ do
                 exit 1
             fi
             ;;
+        --changed-since)
+            if [ "$#" -gt 1 ] && [[ ! $_ARG2 == -* ]]; then
+                changedsince="$_ARG2"
+                shift
+            else
+                echo "Missing git ref after argument $_ARG"
+                echo "$usage"
+                exit 1
+            fi
+            ;;
         --nobel) nobel=$_ARG
             tmpnobel="$nobel"
             ;;
@@ -203,6 +230,11 @@ runcmd "cd $realdocsdir"
 rm docs/tools_selection.csv
 rm docs/tasks_selection.csv
 rm docs/notebooks_selection.csv
+if [[ "$changedsince" != "" ]]; then
+    runcmd "cd $realdocsdir/docs"
+    runcmd "python ../scripts/changed_pages.py '${changedsince}'"
+    runcmd "cd $realdocsdir"
+fi
 if [[ "$tools" == "1" ]]; then
     runcmd "echo '${toolsnames}' > docs/tools_selection.csv"
 fi
@@ -213,12 +245,27 @@ if [[ "$notebooks" == "1" ]]; then
     runcmd "echo '${notebooksnames}' > docs/notebooks_selection.csv"
 fi
 
+# broken links are listed, but don't stop the build
+if [[ "$checklinks" == "1" ]]; then
+    runcmd "cd $realdocsdir/docs"
+    echo "python ../scripts/check_links.py"; eval "python ../scripts/check_links.py"
+    runcmd "cd $realdocsdir"
+fi
+
 #############################################################################################################
 ##
 ## Build casadocs
 ##
 #############################################################################################################
-if [[ "$sphinx" == "1" ]]; then
+if [[ "$watch" == "1" ]]; then
+    runcmd "cd $realdocsdir/docs"
+    if [[ "$copyxml" == "1" ]]; then
+        runcmd "python ../scripts/watch_docs.py --xml $copyxmldevdir"
+    else
+        runcmd "python ../scripts/watch_docs.py"
+    fi
+    runcmd "cd ../"
+elif [[ "$sphinx" == "1" ]]; then
     runcmd "cd $realdocsdir/docs"
     runcmd "sphinx-build -a -E -b html . ./build"
     runcmd "cd ../"
@@ -0,0 +1,73 @@
+##################################################################################
+# summary tables for the api reference pages written by
+# parse_task_xml.py --rst and parse_tool_xml.py --rst
+#
+# stands in for sphinx_automodapi's automodsumm: rather than importing the stub
+# modules, the names and summaries of each module (or tool class) are read from
+# the index the scripts leave next to the pages (api/tt/_*.json). the table and
+# toctree are then made by autosummary as before
+##################################################################################
+
+import glob
+import json
+import os
+from docutils.parsers.rst import directives
+from docutils.statemachine import StringList
+from sphinx.ext.autosummary import Autosummary, extract_summary
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# {module: [[display name, object name, summary lines], ...]}, and the index file each module came from
+INDEX = {}
+SOURCES = {}
+
+
+# read again before every read phase, the index changes when pages are written again during a build
+# session (scripts/watch_docs.py)
+def load_index(app, env=None, docnames=None):
+    INDEX.clear()
+    SOURCES.clear()
+    for fname in sorted(glob.glob(os.path.join(app.srcdir, 'api', 'tt', '_*.json'))):
+        with open(fname) as fid:
+            index = json.load(fid)
+        INDEX.update(index)
+        SOURCES.update(dict([(module, fname) for module in index]))
+
+
+class ApiSummary(Autosummary):
+    required_arguments = 1
+    has_content = False
+    option_spec = dict(Autosummary.option_spec)
+    option_spec['functions-only'] = directives.flag
+    option_spec['classes-only'] = directives.flag
+    option_spec['variables-only'] = directives.flag
+
+    def run(self):
+        modname = self.arguments[0]
+        if modname not in INDEX:
+            logger.warning('apirst: no api pages were generated for %s', modname, location=self.get_source_info())
+            return []
+
+        # like automodsumm, the rest of a module listing page refers to the module
+        if self.name == 'automodsumm':
+            self.env.temp_data['py:module'] = modname
+            self.env.ref_context['py:module'] = modname
+
+        # pages with a summary table are read again when their index changes
+        self.env.note_dependency(SOURCES[modname])
+        self.entries = dict([(ee[0], ee) for ee in INDEX[modname]])
+        self.content = StringList([ee[0] for ee in INDEX[modname]])
+        return Autosummary.run(self)
+
+    def get_items(self, names):
+        return [(name, '', extract_summary(list(self.entries[name][2]), self.state.document), self.entries[name][1])
+                for name in names]
+
+
+def setup(app):
+    app.add_directive('automodsumm', ApiSummary)
+    app.add_directive('apisummary', ApiSummary)
+    app.add_config_value('tool_method_pages', 0, 'env')
+    app.connect('env-before-read-docs', load_index)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
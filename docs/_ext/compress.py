@@ -0,0 +1,205 @@
+##################################################################################
+# minifies the html, css and js of a finished html build, and writes .gz and .br
+# copies next to each file for servers that can send precompressed files
+# (nginx gzip_static / brotli_static, apache mod_rewrite rules...)
+#
+# runs on build-finished (after anything else connected to it with the default
+# priority), with the files spread over a process pool. the minifying only takes out
+# what can't change the page: comments, indentation and runs of whitespace outside
+# <pre>, <textarea>, <script> and <style>. js keeps its line breaks, and files that
+# look minified already are only compressed
+#
+# files whose compressed copies are newer than them are left alone, so an
+# incremental build only does the pages it wrote
+#
+#   minify_output = True                 # in conf.py
+#   precompress_output = ['gz', 'br']    # .br needs the brotli package
+##################################################################################
+
+import gzip
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sphinx.util import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SUFFIXES = ('.html', '.css', '.js')
+
+# smaller files are not worth a compressed copy
+MIN_SIZE = 256
+
+# blocks kept as they are, comments, and tags
+HTML_TOKEN = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)|(<!--.*?-->)|(<[^>]*>)', re.DOTALL | re.IGNORECASE)
+CSS_TOKEN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.DOTALL)
+
+
+# whitespace in text is collapsed to one character, a newline if there was one
+def collapse(text):
+    return re.sub(r'\s+', lambda mm: '\n' if '\n' in mm.group(0) else ' ', text)
+
+
+def minify_html(text):
+    out, pos = [], 0
+    for mm in HTML_TOKEN.finditer(text):
+        out += [collapse(text[pos:mm.start()])]
+        if mm.group(3) is not None:
+            if mm.group(3).startswith('<!--[if'):
+                out += [mm.group(3)]   # conditional comments do something
+        elif (mm.group(2) is not None) and (mm.group(2).lower() == 'style'):
+            start = mm.group(1).index('>') + 1
+            end = mm.group(1).rindex('</')
+            out += [mm.group(1)[:start] + minify_css(mm.group(1)[start:end]) + mm.group(1)[end:]]
+        else:
+            out += [mm.group(0)]
+        pos = mm.end()
+    out += [collapse(text[pos:])]
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(text):
+    # strings are kept, comments dropped (except /*! licenses), and the css between
+    # them has its whitespace taken out around the punctuation
+    pieces, pos = [['css', '']], 0
+    for mm in CSS_TOKEN.finditer(text):
+        pieces[-1][1] += text[pos:mm.start()]
+        if mm.group(1) is not None:
+            pieces += [['str', mm.group(1)], ['css', '']]
+        elif mm.group(2).startswith('/*!'):
+            pieces += [['str', mm.group(2) + '\n'], ['css', '']]
+        else:
+            pieces[-1][1] += ' '
+        pos = mm.end()
+    pieces[-1][1] += text[pos:]
+    for piece in pieces:
+        if piece[0] == 'css':
+            css = re.sub(r'\s+', ' ', piece[1])
+            css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+            css = re.sub(r':\s+', ':', css)
+            piece[1] = re.sub(r';+}', '}', css)
+    return ''.join([piece[1] for piece in pieces]).strip()
+
+
+def minify_js(text):
+    # only whole line comments and indentation are taken out, the line breaks stay
+    # so automatic semicolons still go where they did. left alone: template strings
+    # (which may span lines) and files that are minified already
+    lines = text.split('\n')
+    if ('`' in text) or (len(text) / max(len(lines), 1) > 200):
+        return text
+    out, comment, continued = [], False, False
+    for line in lines:
+        if continued:   # the rest of a string that ended the last line with a backslash
+            out += [line]
+            continued = line.endswith('\\')
+            continue
+        stripped = line.strip()
+        if comment:
+            if '*/' not in stripped:
+                continue
+            comment, stripped = False, stripped[stripped.index('*/') + 2:].strip()
+        elif stripped.startswith('/*') and not stripped.startswith('/*!'):
+            if '*/' not in stripped[2:]:
+                comment = True
+                continue
+            stripped = stripped[stripped.index('*/', 2) + 2:].strip()
+        if (len(stripped) == 0) or stripped.startswith('//'):
+            continue
+        out += [stripped]
+        continued = stripped.endswith('\\')
+    return '\n'.join(out) + '\n'
+
+
+MINIFY = {'.html': minify_html, '.css': minify_css, '.js': minify_js}
+
+
+def compress(data, encoding):
+    if encoding == 'gz':
+        return gzip.compress(data, 9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+# minifies and compresses one file, returns its size before and after minifying and the sizes of each
+# compressed copy written {encoding: (size before minifying, compressed size)}
+def process(args):
+    fname, minify, encodings = args
+    with open(fname, 'rb') as fid:
+        data = fid.read()
+    before = len(data)
+    if minify and not re.search(r'\.min\.(css|js)$', fname):
+        try:
+            text = MINIFY[os.path.splitext(fname)[1]](data.decode('utf-8'))
+        except UnicodeDecodeError:
+            text = None
+        if (text is not None) and (len(text.encode('utf-8')) < before):
+            data = text.encode('utf-8')
+            with open(fname, 'wb') as fid:
+                fid.write(data)
+
+    sizes = {}
+    for encoding in encodings if len(data) >= MIN_SIZE else []:
+        packed = compress(data, encoding)
+        if len(packed) < len(data):
+            with open(fname + '.' + encoding, 'wb') as fid:
+                fid.write(packed)
+            sizes[encoding] = (before, len(packed))
+        elif os.path.exists(fname + '.' + encoding):
+            os.remove(fname + '.' + encoding)
+    return before, len(data), sizes
+
+
+# true if every compressed copy is there and newer than the file
+def done(fname, encodings):
+    mtime = os.path.getmtime(fname)
+    return (len(encodings) > 0) and all([os.path.exists(fname + '.' + ee) and (os.path.getmtime(fname + '.' + ee) >= mtime)
+                                         for ee in encodings])
+
+
+def size(count):
+    return '%.1f MB' % (count / 1048576.0) if count >= 1048576 else '%.1f kB' % (count / 1024.0)
+
+
+def build_finished(app, exception):
+    if (exception is not None) or (app.builder.format != 'html'):
+        return
+    encodings = [ee for ee in app.config.precompress_output if ee in ['gz', 'br']]
+    if ('br' in encodings) and (brotli is None):
+        logger.warning('compress: the brotli package is not installed, only writing .gz files')
+        encodings.remove('br')
+    if (not app.config.minify_output) and (len(encodings) == 0):
+        return
+
+    start = time.time()
+    fnames = []
+    for root, dirs, files in os.walk(app.outdir):
+        fnames += [os.path.join(root, ff) for ff in files if ff.endswith(SUFFIXES)]
+    fnames = [ff for ff in sorted(fnames) if not done(ff, encodings)]
+    if len(fnames) == 0:
+        return
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        results = list(pool.map(process, [(ff, app.config.minify_output, encodings) for ff in fnames], chunksize=16))
+
+    before, after = sum([rr[0] for rr in results]), sum([rr[1] for rr in results])
+    report = ['%i files' % len(fnames)]
+    if app.config.minify_output:
+        report += ['minified %s -> %s (%s saved)' % (size(before), size(after), size(before - after))]
+    for encoding in encodings:
+        plain = sum([rr[2][encoding][0] for rr in results if encoding in rr[2]])
+        packed = sum([rr[2][encoding][1] for rr in results if encoding in rr[2]])
+        report += ['.%s %s (%s saved)' % (encoding, size(packed), size(plain - packed))]
+    logger.info('compress: %s in %.1fs' % (', '.join(report), time.time() - start))
+
+
+def setup(app):
+    app.add_config_value('minify_output', True, 'html')
+    app.add_config_value('precompress_output', ['gz', 'br'], 'html')
+    # late, so files renamed or rewritten by other build-finished handlers are done first
+    app.connect('build-finished', build_finished, priority=900)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
@@ -0,0 +1,189 @@
+##################################################################################
+# gives the static files of a finished html build (_static, with the theme css, js and
+# fonts, and _images, with the figures and notebook outputs) names with a hash of
+# their content in them, theme.css -> theme.1f3a9c0b2e.css, and points the html
+# pages and stylesheets at the new names
+#
+# a file's name then only ever stands for one content, so the web server can send
+# everything listed in the manifest (asset-manifest.json in the build folder,
+# {original path: hashed path}) with long lived cache headers, e.g. for nginx
+#
+#   location ~ "\.[0-9a-f]{10}\.\w+$" { add_header Cache-Control "public, max-age=31536000, immutable"; }
+#
+# files named in any js file (doctools.js swaps plus.png and minus.png by name) keep
+# their names, and so does anything outside _static and _images
+#
+# runs on build-finished before compress.py. sphinx copies the static files again on
+# each build, under their own names: a copy whose hashed file is already there is
+# removed, and when a file's content changed every page is pointed at its new name,
+# otherwise only the pages written by this build are
+##################################################################################
+
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote, unquote
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+FOLDERS = ['_static', '_images']
+MANIFEST = 'asset-manifest.json'
+
+# when the current build started reading, pages written since then are this build's
+STARTED = [0.0]
+
+HASHED = re.compile(r'\.[0-9a-f]{10}\.[^./]+$')
+HTML_REF = re.compile(r'\b(src|href)="([^"]*)"')
+CSS_REF = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)|@import\s+([\'"])([^\'"]+)\3')
+
+
+def hashed_name(path, data):
+    stem, ext = os.path.splitext(path)
+    return '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:10], ext)
+
+
+# the file (relative to the build folder) a url in fname points to, or None for other sites and anchors
+def target(url, fname, outdir):
+    if re.match(r'^[a-zA-Z][\w+.-]*:', url) or url.startswith(('/', '#')):
+        return None
+    path = re.split(r'[?#]', url, 1)[0]
+    return os.path.normpath(os.path.join(os.path.relpath(os.path.dirname(fname), outdir), unquote(path)))
+
+
+# the url with the file name it ends in changed to the hashed one, or None if it isn't a renamed asset
+def rename_url(url, fname, outdir, renamed):
+    path = target(url, fname, outdir)
+    if path not in renamed:
+        return None
+    end = re.split(r'[?#]', url, 1)[0]
+    prefix, name = end[:end.rfind('/') + 1], os.path.basename(renamed[path])
+    return prefix + (name if unquote(end[len(prefix):]) == end[len(prefix):] else quote(name)) + url[len(end):]
+
+
+def css_refs(text):
+    return [mm.group(2) if mm.group(2) is not None else mm.group(4) for mm in CSS_REF.finditer(text)]
+
+
+def rewrite_css(text, fname, outdir, renamed):
+    def replace(mm):
+        url = mm.group(2) if mm.group(2) is not None else mm.group(4)
+        new = rename_url(url.strip(), fname, outdir, renamed)
+        return mm.group(0) if new is None else mm.group(0).replace(url.strip(), new)
+    return CSS_REF.sub(replace, text)
+
+
+# points a batch of html pages at the renamed assets, returns how many of them changed
+def rewrite_pages(args):
+    fnames, outdir, renamed = args
+    count = 0
+    for fname in fnames:
+        with open(fname, 'r', encoding='utf-8') as fid:
+            text = fid.read()
+
+        def replace(mm):
+            new = rename_url(mm.group(2), fname, outdir, renamed)
+            return mm.group(0) if new is None else '%s="%s"' % (mm.group(1), new)
+        new = HTML_REF.sub(replace, text)
+        if new != text:
+            with open(fname, 'w', encoding='utf-8') as fid:
+                fid.write(new)
+            count += 1
+    return count
+
+
+def build_finished(app, exception):
+    if (exception is not None) or (app.builder.format != 'html') or (not app.config.fingerprint_assets):
+        return
+    start = time.time()
+    outdir = app.outdir
+    manifest = {}
+    if os.path.exists(os.path.join(outdir, MANIFEST)):
+        with open(os.path.join(outdir, MANIFEST)) as fid:
+            manifest = json.load(fid)
+
+    # the static files sphinx copied under their own names (relative to the build folder), and the js
+    scripts, assets = {}, []
+    for folder in FOLDERS:
+        for root, dirs, files in os.walk(os.path.join(outdir, folder)):
+            for ff in sorted(files):
+                path = os.path.relpath(os.path.join(root, ff), outdir)
+                if ff.endswith('.js'):
+                    with open(os.path.join(outdir, path), 'r', encoding='utf-8', errors='replace') as fid:
+                        scripts[path] = fid.read()
+                if (HASHED.search(ff) is None) and (not ff.endswith(('.gz', '.br'))):
+                    assets += [path]
+    assets = [aa for aa in assets if not any([os.path.basename(aa) in text for ss, text in scripts.items() if ss != aa])]
+
+    # stylesheets go last, after what they point to (including other stylesheets they @import)
+    stylesheets = {}
+    for path in [aa for aa in assets if aa.endswith('.css')]:
+        with open(os.path.join(outdir, path), 'r', encoding='utf-8') as fid:
+            stylesheets[path] = fid.read()
+    order = [aa for aa in assets if aa not in stylesheets]
+    pending = list(stylesheets)
+    while len(pending) > 0:
+        ready = [cc for cc in pending if not any([target(uu.strip(), os.path.join(outdir, cc), outdir) in pending
+                                                  for uu in css_refs(stylesheets[cc])])]
+        ready = pending if len(ready) == 0 else ready
+        order += ready
+        pending = [cc for cc in pending if cc not in ready]
+
+    renamed, found = dict(manifest), {}
+    for path in order:
+        fname = os.path.join(outdir, path)
+        if path in stylesheets:
+            data = rewrite_css(stylesheets[path], fname, outdir, renamed).encode('utf-8')
+        else:
+            with open(fname, 'rb') as fid:
+                data = fid.read()
+        found[path] = renamed[path] = hashed_name(path, data)
+        if os.path.exists(os.path.join(outdir, found[path])):
+            os.remove(fname)
+        elif path in stylesheets:
+            with open(os.path.join(outdir, found[path]), 'wb') as fid:
+                fid.write(data)
+            os.remove(fname)
+        else:
+            os.replace(fname, os.path.join(outdir, found[path]))
+
+    # an asset whose content changed: every page goes to the new name and the old file is removed,
+    # otherwise only the pages written by this build need pointing at the assets
+    changed = [pp for pp in found if (pp in manifest) and (manifest[pp] != found[pp])]
+    for path in changed:
+        renamed[manifest[path]] = found[path]
+        for ff in [manifest[path], manifest[path] + '.gz', manifest[path] + '.br']:
+            if os.path.exists(os.path.join(outdir, ff)):
+                os.remove(os.path.join(outdir, ff))
+    pages = []
+    for root, dirs, files in os.walk(outdir):
+        pages += [os.path.join(root, ff) for ff in files if ff.endswith('.html')]
+    if len(changed) == 0:
+        pages = [ff for ff in pages if os.path.getmtime(ff) >= STARTED[0] - 1]
+
+    count = 0
+    if len(pages) > 0:
+        batches = [sorted(pages)[ii:ii + 50] for ii in range(0, len(pages), 50)]
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            count = sum(pool.map(rewrite_pages, [(bb, outdir, renamed) for bb in batches]))
+
+    new = len([pp for pp in found if pp not in manifest])
+    manifest.update(found)
+    with open(os.path.join(outdir, MANIFEST), 'w') as fid:
+        json.dump(dict(sorted(manifest.items())), fid, indent=1)
+    logger.info('fingerprint: %i assets (%i new, %i changed), %i pages rewritten in %.1fs' %
+                (len(found), new, len(changed), count, time.time() - start))
+
+
+def build_started(app, env, docnames):
+    STARTED[0] = time.time()
+
+
+def setup(app):
+    app.add_config_value('fingerprint_assets', True, 'html')
+    app.connect('env-before-read-docs', build_started)
+    app.connect('build-finished', build_finished)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
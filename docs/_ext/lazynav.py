@@ -0,0 +1,73 @@
+##################################################################################
+# the sidebar navigation, written once per build rather than in to every page
+#
+# with navigation_depth 5, every page of the build had its own copy of the toctree,
+# thousands of links on the api pages. instead the whole tree is rendered once (as
+# if for a page at the top of the build, so every link starts from there) and
+# written to _navigation.js as a json string. the pages only have the top level of
+# the tree (_templates/layout.html), and _static/lazynav.js swaps the whole tree in,
+# opened at the page being read, the way the theme does it. the tree is kept in
+# sessionStorage, so it is fetched once per visit
+#
+# sphinx works out the whole tree again for each toctree() a page template asks for,
+# even for the top level only, so that is rendered once as well and each page gets a
+# copy with its links moved to start from the page
+#
+# the js file (rather than a fetched html fragment) also works when the build is
+# opened from disk, and ?v=<hash of the tree> on its url tells an old copy apart
+##################################################################################
+
+import hashlib
+import json
+import os
+import re
+from sphinx.environment.adapters.toctree import TocTree
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+NAVIGATION = '_navigation.js'
+
+# the url (from the top of the build) pages load the tree from, and the top level of it, set each build
+SOURCE = ['']
+TOP = ['']
+
+
+# renders the whole tree and writes it, once the documents are read and before any page is written
+def write_navigation(app, env):
+    SOURCE[0] = ''
+    if (app.builder.format != 'html') or (not app.config.lazy_navigation):
+        return
+    options = app.config.html_theme_options
+    # the theme's defaults for the options not set in conf.py
+    kwargs = {'includehidden': options.get('includehidden', True), 'titles_only': options.get('titles_only', False)}
+    toctree = TocTree(env).get_toctree_for('_navigation', app.builder, False, maxdepth=int(options.get('navigation_depth', 4)), **kwargs)
+    html = app.builder.render_partial(toctree)['fragment'] if toctree is not None else ''
+    top = TocTree(env).get_toctree_for('_navigation', app.builder, True, maxdepth=1, **kwargs)
+    TOP[0] = app.builder.render_partial(top)['fragment'] if top is not None else ''
+    text = 'window.LAZYNAV = %s;\n' % json.dumps(html)
+    os.makedirs(app.outdir, exist_ok=True)
+    with open(os.path.join(app.outdir, NAVIGATION), 'w') as fid:
+        fid.write(text)
+    SOURCE[0] = '%s?v=%s' % (NAVIGATION, hashlib.sha256(text.encode('utf-8')).hexdigest()[:10])
+    logger.info('lazynav: navigation written to %s (%i bytes)' % (NAVIGATION, len(text)))
+
+
+def page_context(app, pagename, templatename, context, doctree):
+    if len(SOURCE[0]) > 0:
+        context['lazy_navigation_src'] = context['pathto'](SOURCE[0], 1)
+        root = context['lazy_navigation_src'][:-len(SOURCE[0])]
+        context['lazy_navigation_top'] = re.sub(r'href="(?![a-zA-Z][\w+.-]*:|/|#)', 'href="' + root, TOP[0])
+
+
+def add_script(app):
+    if app.config.lazy_navigation:
+        app.add_js_file('lazynav.js')
+
+
+def setup(app):
+    app.add_config_value('lazy_navigation', True, 'html')
+    app.connect('builder-inited', add_script)
+    app.connect('env-updated', write_navigation)
+    app.connect('html-page-context', page_context)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
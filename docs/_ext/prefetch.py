@@ -0,0 +1,39 @@
+##################################################################################
+# prefetch hints for the next and previous pages in the toctree, so moving through
+# a guide (calibration, imaging, image analysis...) in order finds the next page
+# already in the browser cache
+#
+# each page gets <link rel="prefetch"> tags in its head for its next and previous
+# pages. the browser fetches those when it is otherwise idle, only the html of the
+# page, not its images
+#
+# with prefetch_on_hover, _static/prefetch.js also fetches a page of the docs when the
+# pointer rests on a link to it (or a finger touches it). that stops for the rest of
+# the visit once prefetch_session_limit bytes have been fetched this way, and it is
+# off altogether for readers asking to save data or on a 2g connection
+##################################################################################
+
+import html
+
+
+def page_context(app, pagename, templatename, context, doctree):
+    if not app.config.prefetch_adjacent:
+        return
+    hints = ['<link rel="prefetch" href="%s">' % html.escape(context[rel]['link'], True) for rel in ['next', 'prev']
+             if (context.get(rel) is not None) and ('link' in context[rel])]
+    if len(hints) > 0:
+        context['metatags'] = context.get('metatags', '') + '\n' + '\n'.join(hints) + '\n'
+
+
+def add_script(app):
+    if app.config.prefetch_on_hover and (app.builder.format == 'html'):
+        app.add_js_file('prefetch.js', **{'data-limit': str(int(app.config.prefetch_session_limit))})
+
+
+def setup(app):
+    app.add_config_value('prefetch_adjacent', True, 'html')
+    app.add_config_value('prefetch_on_hover', True, 'html')
+    app.add_config_value('prefetch_session_limit', 2 * 1024 * 1024, 'html')
+    app.connect('builder-inited', add_script)
+    app.connect('html-page-context', page_context)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
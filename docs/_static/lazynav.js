@@ -0,0 +1,145 @@
+// swaps the top level navigation of the page for the whole tree, written once per build by
+// _ext/lazynav.py, opened at this page the way the theme opens it
+(function () {
+    'use strict';
+
+    // the links in the tree start from the top of the build
+    function rebase(nav, root) {
+        var links = nav.querySelectorAll('a[href]');
+        for (var ii = 0; ii < links.length; ii++) {
+            var href = links[ii].getAttribute('href');
+            if (!/^([a-zA-Z][\w+.-]*:|\/|#)/.test(href)) {
+                links[ii].setAttribute('href', root + href);
+            }
+        }
+    }
+
+    function page(url) {
+        return url.split('#')[0].split('?')[0].replace(/index\.html$/, '');
+    }
+
+    // this page's entry and the ones above it are current, the theme opens those
+    function open(nav) {
+        var here = page(window.location.href);
+        var links = nav.querySelectorAll('a[href]');
+        for (var ii = 0; ii < links.length; ii++) {
+            if ((links[ii].href.indexOf('#') < 0) && (page(links[ii].href) === here)) {
+                links[ii].classList.add('current');
+                for (var node = links[ii].parentNode; node && (node !== nav); node = node.parentNode) {
+                    if ((node.tagName === 'LI') || (node.tagName === 'UL')) {
+                        node.classList.add('current');
+                    }
+                }
+                return;
+            }
+        }
+    }
+
+    // like the theme's toggleCurrent, opening an entry closes its siblings
+    function toggle(ev) {
+        ev.preventDefault();
+        ev.stopPropagation();
+        var item = this.parentNode.parentNode;
+        var siblings = item.parentNode.children;
+        for (var ii = 0; ii < siblings.length; ii++) {
+            if (siblings[ii] !== item) {
+                siblings[ii].classList.remove('current');
+                var opened = siblings[ii].querySelectorAll('li.current');
+                for (var jj = 0; jj < opened.length; jj++) {
+                    opened[jj].classList.remove('current');
+                }
+            }
+        }
+        var children = item.querySelectorAll(':scope > ul li');
+        if (children.length > 0) {
+            for (var kk = 0; kk < children.length; kk++) {
+                children[kk].classList.remove('current');
+            }
+            item.classList.toggle('current');
+        }
+    }
+
+    // the +/- in front of each entry with entries under it
+    function expanders(nav) {
+        var lists = nav.querySelectorAll('ul');
+        for (var ii = 0; ii < lists.length; ii++) {
+            var link = lists[ii].previousElementSibling;
+            if (lists[ii].classList.contains('simple') || !link || (link.tagName !== 'A') || link.querySelector('.toctree-expand')) {
+                continue;
+            }
+            var expand = document.createElement('span');
+            expand.className = 'toctree-expand';
+            expand.addEventListener('click', toggle);
+            link.insertBefore(expand, link.firstChild);
+        }
+    }
+
+    // the theme adds its own +/- as well when it starts after the tree is in, one is kept
+    function dedupe(holder) {
+        var links = holder.querySelectorAll('a');
+        for (var ii = 0; ii < links.length; ii++) {
+            var expand = links[ii].querySelectorAll(':scope > .toctree-expand');
+            for (var jj = 1; jj < expand.length; jj++) {
+                links[ii].removeChild(expand[jj]);
+            }
+        }
+    }
+
+    function show(holder, root, html) {
+        var nav = document.createElement('div');
+        nav.innerHTML = html;
+        rebase(nav, root);
+        open(nav);
+        expanders(nav);
+        holder.innerHTML = '';
+        while (nav.firstChild) {
+            holder.appendChild(nav.firstChild);
+        }
+        if (document.readyState !== 'complete') {
+            window.addEventListener('load', function () {
+                dedupe(holder);
+            });
+        }
+    }
+
+    function load() {
+        var holder = document.querySelector('[data-lazynav]');
+        if (!holder) {
+            return;
+        }
+        var src = holder.getAttribute('data-lazynav');
+        var root = src.split('?')[0];
+        root = root.slice(0, root.lastIndexOf('/') + 1);
+        var key = 'lazynav:' + src.split('?')[1];
+        var cached = null;
+        try {
+            cached = window.sessionStorage.getItem(key);
+        } catch (err) {
+            // no storage (private mode, opened from disk), the tree is loaded on each page
+        }
+        if (cached !== null) {
+            return show(holder, root, cached);
+        }
+        // a script rather than a request, which also works for a build opened from disk.
+        // if it doesn't load, the top level navigation stays
+        var script = document.createElement('script');
+        script.src = src;
+        script.onload = function () {
+            if (typeof window.LAZYNAV !== 'string') {
+                return;
+            }
+            try {
+                window.sessionStorage.setItem(key, window.LAZYNAV);
+            } catch (err) {
+                // over the storage quota, it is loaded again next page
+            }
+            show(holder, root, window.LAZYNAV);
+        };
+        document.head.appendChild(script);
+    }
+
+    // usually after the theme's own ready handler
+    document.addEventListener('DOMContentLoaded', function () {
+        window.setTimeout(load, 0);
+    });
+})();
@@ -0,0 +1,96 @@
+// prefetches a page of the docs when the pointer rests on a link to it, up to the limit
+// (bytes per visit) given by _ext/prefetch.py as data-limit on this script's tag
+(function () {
+    'use strict';
+
+    var LIMIT = parseInt((document.currentScript && document.currentScript.getAttribute('data-limit')) || '0', 10);
+    var KEY = 'prefetch:bytes';
+    var DELAY = 65;   // ms on a link before it counts as resting there
+
+    var fetched = {};
+    var timer = null;
+
+    // the next and previous pages are in the page's own prefetch hints already
+    var hints = document.querySelectorAll('link[rel="prefetch"]');
+    for (var ii = 0; ii < hints.length; ii++) {
+        fetched[hints[ii].href.split('#')[0]] = true;
+    }
+
+    // readers who asked to save data, or on a slow connection, get no extra requests
+    function allowed() {
+        var connection = navigator.connection;
+        if (connection && (connection.saveData || /2g/.test(connection.effectiveType || ''))) {
+            return false;
+        }
+        return (window.location.protocol !== 'file:') && (used() < LIMIT);
+    }
+
+    function used() {
+        try {
+            return parseInt(window.sessionStorage.getItem(KEY) || '0', 10);
+        } catch (err) {
+            return LIMIT;   // no storage to keep count in, no prefetching
+        }
+    }
+
+    // what a prefetch cost, as the browser reports it (nothing if it came from the cache)
+    function count(url) {
+        var entries = window.performance && performance.getEntriesByName ? performance.getEntriesByName(url) : [];
+        var entry = entries.length > 0 ? entries[entries.length - 1] : null;
+        var size = entry ? (entry.transferSize || entry.encodedBodySize || 0) : 0;
+        try {
+            window.sessionStorage.setItem(KEY, String(used() + size));
+        } catch (err) {
+            // storage full, the count stays where it was
+        }
+    }
+
+    // a page of the docs other than this one, not fetched yet
+    function page(link) {
+        if (!link || !link.href || link.hasAttribute('download') || (link.origin !== window.location.origin)) {
+            return null;
+        }
+        var url = link.href.split('#')[0];
+        if ((url === window.location.href.split('#')[0]) || fetched[url] || !/(\.html|\/)$/.test(url.split('?')[0])) {
+            return null;
+        }
+        return url;
+    }
+
+    function prefetch(url) {
+        if (!allowed()) {
+            return;
+        }
+        fetched[url] = true;
+        var hint = document.createElement('link');
+        hint.rel = 'prefetch';
+        hint.href = url;
+        hint.onload = function () {
+            count(url);
+        };
+        document.head.appendChild(hint);
+    }
+
+    document.addEventListener('mouseover', function (ev) {
+        var url = page(ev.target.closest && ev.target.closest('a[href]'));
+        if (url !== null) {
+            window.clearTimeout(timer);
+            timer = window.setTimeout(function () {
+                prefetch(url);
+            }, DELAY);
+        }
+    });
+
+    document.addEventListener('mouseout', function (ev) {
+        if (ev.target.closest && ev.target.closest('a[href]')) {
+            window.clearTimeout(timer);
+        }
+    });
+
+    document.addEventListener('touchstart', function (ev) {
+        var url = page(ev.target.closest && ev.target.closest('a[href]'));
+        if (url !== null) {
+            prefetch(url);
+        }
+    }, {passive: true});
+})();
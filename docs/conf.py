@@ -17,6 +17,7 @@ import sys
 import re
 import glob
 sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath('_ext'))
 
 
 # -- Project information -----------------------------------------------------
@@ -46,6 +47,29 @@ extensions = [
     'sphinx_automodapi.automodapi',
     'recommonmark'
 ]
+
+# write the api reference pages (api/tt) straight from the task and tool xml, with the summary
+# tables read from the index written alongside them (_ext/apirst.py), rather than importing
+# python stubs through automodsumm and autodoc. set to False to go back to the stubs
+direct_api = True
+if direct_api:
+    extensions[extensions.index('sphinx_automodapi.automodapi')] = 'apirst'
+
+# with direct_api, tools with at least this many methods (image, ms, msmetadata...) get a summary page
+# and a page for each method rather than all of them on one page, 0 keeps every tool on a single page
+tool_method_pages = 40
+
+# put a hash of their content in the names of the static files and images of the build, listed in
+# build/asset-manifest.json, so the web server can let browsers cache them for good (_ext/fingerprint.py)
+extensions += ['fingerprint']
+fingerprint_assets = True
+
+# minify the html, css and js of the build and write .gz and .br copies of them for the web server
+# (_ext/compress.py), .br needs the brotli package
+extensions += ['compress']
+minify_output = True
+precompress_output = ['gz', 'br']
+
 nbsphinx_allow_errors = True
 nbsphinx_execute = 'never'
 todo_include_todos = True
@@ -121,6 +145,11 @@ html_theme_options = {
     'logo_only': True
 }
 
+# pages only carry the top level of the navigation, the whole tree is written once to build/_navigation.js
+# and loaded in to the sidebar by _static/lazynav.js (_ext/lazynav.py, _templates/layout.html)
+extensions += ['lazynav']
+lazy_navigation = True
+
 # Add any paths that contain custom static files (such as style sheets) here,
 # relative to this directory. They are copied after the builtin static files,
 # so a file named "default.css" will overwrite the builtin "default.css".
@@ -175,9 +204,9 @@ latex_documents = [
 ##
 #############################################################################################################
 os.system("python ../scripts/download_xml.py")
-os.system("python ../scripts/parse_pull_requests.py")
-os.system("python ../scripts/parse_task_xml.py")
-os.system("python ../scripts/parse_tool_xml.py")
+os.system("python ../scripts/parse_pull_requests.py --per-release")
+os.system("python ../scripts/parse_task_xml.py" + (" --rst" if direct_api else ""))
+os.system("python ../scripts/parse_tool_xml.py" + (" --rst --method-pages %i" % tool_method_pages if direct_api else ""))
 
 if not os.path.exists('examples'):
     os.system("git clone https://github.com/casangi/examples.git")
@@ -185,9 +214,16 @@ if not os.path.exists('examples'):
 # this can build a txt version of the API
 #os.system("sphinx-build -d _build/doctrees -b text . _build/html -c ./api")
 
+# prefetch the next and previous pages, and a page when the pointer rests on a link to it (up to 2 MB
+# a visit, _ext/prefetch.py)
+prefetch_adjacent = True
+prefetch_on_hover = True
+prefetch_session_limit = 2 * 1024 * 1024
+
 # tweak the default readthedocs theme
 def setup(app):
     app.add_css_file('customization.css')
+    app.setup_extension('prefetch')
 
 #############################################################################################################
 ##
@@ -199,7 +235,9 @@ def setup(app):
 for dirname, prefix, postfix, group in [('api/tt/', 'casatools.', '.rst', 'tools'), ('api/tt/', 'casatasks.', '.rst', 'tasks'), ('notebooks/', '', '.ipynb', 'notebooks')]:
     if os.path.exists(f"{group}_selection.csv"):
         fnames = []
-        if group == 'tools':
+        if direct_api and (group != 'notebooks'):
+            fnames = [fn for fn in os.listdir(dirname) if fn.startswith(prefix) and fn.endswith(postfix)] if os.path.exists(dirname) else []
+        elif group == 'tools':
             fnames = ['casatools.'+fn for fn in os.listdir('../casatools') if fn != '__init__.py']
         elif group == 'tasks':
             files = glob.glob('../casatasks/**/*.py', recursive=True)
@@ -212,6 +250,13 @@ for dirname, prefix, postfix, group in [('api/tt/', 'casatools.', '.rst', 'tools
         with open(f"{group}_selection.csv", 'r') as fin:
             selection = [f"{prefix}{name}{postfix}" for name in fin.readlines()[0].strip().split(',')]
         exclusions = [name for name in fnames if (name not in selection)]
+        if group == 'tools':
+            # the method pages of a tool (casatools.<tool>.<tool>.<method>) go with it
+            exclusions = [name for name in fnames if ('.'.join(name.split('.')[:2]) + postfix) not in selection]
+        if group == 'tasks':
+            # tasks given as *.<name> (changed_pages.py) are in whatever category the xml puts them
+            anywhere = [name[len(prefix) + 2:-len(postfix)] for name in selection if name.startswith(prefix + '*.')]
+            exclusions = [name for name in exclusions if name[:-len(postfix)].split('.')[-1] not in anywhere]
         exclude_patterns += [f"{dirname}{name}" for name in exclusions]
 
 # uncomment this line to prevent the examples from being built
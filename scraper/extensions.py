@@ -0,0 +1,164 @@
+# Define here the extensions for your scraper
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import threads
+
+from scraper.pagestore import crawler_store
+from scraper.pipelines import page_saved
+
+
+class SplashRenderLog:
+    # Records how long splash took on every page it rendered and writes them to the
+    # SPLASH_RENDER_LOG csv file when the spider closes, so the crawl time of the
+    # different SPLASH_WAIT_MODE settings can be compared.
+    #
+    # latency is the full splash round trip as seen by scrapy. The adaptive lua script
+    # also reports the page's own render time, how long it polled, and whether the page
+    # was ready before SPLASH_MAX_WAIT ran out.
+
+    def __init__(self, stats, filename):
+        self.stats = stats
+        self.filename = filename
+        self.rows = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get('SPLASH_RENDER_LOG'):
+            raise NotConfigured
+        ext = cls(crawler.stats, crawler.settings.get('SPLASH_RENDER_LOG'))
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def response_received(self, response, request, spider):
+        if 'splash' not in request.meta:
+            return
+        splash = request.meta['splash']
+        data = getattr(response, 'data', None)
+        data = data if isinstance(data, dict) else {}
+
+        latency = request.meta.get('download_latency', 0.0)
+        render_time = data.get('render_time', latency)
+        self.rows += [(splash['args'].get('url', response.url), splash.get('endpoint', ''), response.status,
+                       '%.3f' % latency, '%.3f' % render_time, data.get('waited', ''), data.get('ready', ''))]
+
+        self.stats.inc_value('splash/render_count')
+        self.stats.inc_value('splash/render_time', render_time, start=0.0)
+        if data.get('ready') is False:
+            self.stats.inc_value('splash/render_not_ready')
+
+    def spider_closed(self, spider):
+        with open(self.filename, 'w', newline='') as fid:
+            writer = csv.writer(fid)
+            writer.writerow(['url', 'endpoint', 'status', 'latency', 'render_time', 'waited', 'ready'])
+            writer.writerows(self.rows)
+
+        if len(self.rows) > 0:
+            total = self.stats.get_value('splash/render_time', 0.0)
+            spider.logger.info('Splash rendered %i pages in %.1f s (%.2f s per page), details in %s' %
+                               (len(self.rows), total, total / len(self.rows), self.filename))
+
+
+class StreamingConvert:
+    # Converts pages to markdown / rst with scripts/convert_html.py while the crawl is still
+    # running, instead of waiting for the whole page store. Each page saved by the
+    # PageWriterPipeline is checked off against the sitemap, and as soon as every page of a
+    # conversion unit (a task or tool with its examples and developer subpages, otherwise a
+    # single page) is on disk, the unit goes to a pool of CONVERT_WORKERS threads running pandoc.
+    #
+    # When the spider closes, a final pass walks the sitemap in order, converts whatever the
+    # stream didn't get to (units with a page that failed, or parents of removed subpages) and
+    # reports the pages that have no output, so build_notebooks.py finds the same files as
+    # after a separate convert_html.py run.
+
+    def __init__(self, convert, store, media, urls, workers):
+        self.convert = convert
+        self.store = store
+        self.media = media
+        self.urls = urls
+        self.units = dict([(uu, convert.unit(uu)) for uu in urls])
+        self.waiting = {}
+        for uu in urls:
+            self.waiting.setdefault(self.units[uu], set()).add(uu)
+        self.saved = set()
+        self.submitted = {}
+        self.prepared = False
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('STREAM_CONVERT'):
+            raise NotConfigured
+        # the conversion lives with the other build scripts
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+        import convert_html
+        from media_cache import MediaCache
+        with open(crawler.settings.get('SITEMAP_FILE')) as fid:
+            urls = fid.read().splitlines()
+        media = MediaCache(crawler.settings.get('MEDIA_CACHE')) if crawler.settings.get('MEDIA_CACHE') else None
+        ext = cls(convert_html, crawler_store(crawler), media, urls, max(1, crawler.settings.getint('CONVERT_WORKERS')))
+        crawler.signals.connect(ext.page_saved, signal=page_saved)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    # a full crawl starts the outputs over, the same as convert_html.py without a change list
+    # (spiders that don't say, like the single page spider, convert on top of what is there)
+    def prepare(self, spider):
+        if not self.prepared:
+            self.prepared = True
+            if not getattr(spider, 'incremental', True):
+                self.convert.clean_outputs()
+
+    def submit(self, unit):
+        self.submitted[unit] = self.executor.submit(self.convert.convert_page, self.store, unit, self.media)
+
+    def page_saved(self, item, spider):
+        self.prepare(spider)
+        url = item['url']
+        self.saved.add(url)
+        unit = self.convert.unit(url)
+        self.waiting.get(unit, set()).discard(url)
+        if (len(self.waiting.get(unit, [])) == 0) and (unit not in self.submitted):
+            self.submit(unit)
+
+    def spider_closed(self, spider):
+        self.prepare(spider)
+        return threads.deferToThread(self.finish, spider)
+
+    def finish(self, spider):
+        changes = getattr(spider, 'changes', {'removed': []})
+        parents = self.convert.remove_outputs(changes['removed']) if getattr(spider, 'incremental', True) else set()
+        streamed = len(self.submitted)
+
+        # whatever the stream couldn't finish, in sitemap order
+        for url in self.urls:
+            unit = self.units[url]
+            if (unit not in self.submitted) and ((url in self.saved) or (unit in parents)):
+                self.submit(unit)
+        self.executor.shutdown(wait=True)
+        if self.media is not None:
+            self.media.save()
+
+        converted, failed = 0, []
+        for unit, job in self.submitted.items():
+            if job.exception() is not None:
+                failed += [unit]
+                spider.logger.error('Failed to convert %s: %s' % (unit, job.exception()))
+            elif job.result() is not None:
+                converted += 1
+
+        # a full crawl should have saved every page in the sitemap
+        missing = [uu for uu in self.urls if uu not in self.saved] if not getattr(spider, 'incremental', True) else []
+        for url in missing:
+            spider.logger.warning('No page saved to convert for %s' % url)
+        spider.logger.info('Converted %i pages (%i while crawling, %i after), %i failed, %i missing' %
+                           (converted, streamed, len(self.submitted) - streamed, len(failed), len(missing)))
@@ -6,7 +6,12 @@
 import scrapy
 
 
-class ScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+class PageItem(scrapy.Item):
+    # one casadocs page, as extracted by the spiders and saved by the PageWriterPipeline
+    url = scrapy.Field()    # sitemap url of the page, the key it is saved under in the page store
+    title = scrapy.Field()  # page title from the plone navigation tree
+    body = scrapy.Field()   # html of the page #content
+
+    # scrapy logs every scraped item, the url and title are enough to tell which page it was
+    def __repr__(self):
+        return '<PageItem %s %r>' % (self.get('url'), self.get('title'))
@@ -3,7 +3,17 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import json
+import math
+import time
+from urllib.parse import urljoin
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy_splash import SlotPolicy
+from twisted.internet import defer
+from twisted.internet.error import TCPTimedOutError, TimeoutError
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -56,48 +66,282 @@ class ScraperSpiderMiddleware:
         spider.logger.info('Spider opened: %s' % spider.name)
 
 
+# guide pages are grouped by their top level section, tasks and tools each get one group
+def url_section(url):
+    if url.split("/")[4:5] != ['stable']:
+        return 'other'   # robots.txt etc
+    path = url.split("/")[5:]
+    if 'global-task-list' in path:
+        return 'tasks'
+    if 'global-tool-list' in path:
+        return 'tools'
+    return 'guide/%s' % path[0] if len(path) > 0 else 'index'
+
+
+# nearest rank percentile of an already sorted list
+def percentile(values, pct):
+    return values[max(0, int(math.ceil(pct / 100.0 * len(values))) - 1)]
+
+
 class ScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    # Records how every page download went, so the crawl settings (concurrency, render mode,
+    # splash waits) can be tuned from data: the time the request sat in the downloader queue,
+    # the download latency (the full splash render for splash requests), the response size,
+    # the number of redirects and the final status.
+    #
+    # When the spider closes, percentiles for each url_section are logged and, together with
+    # the CRAWL_METRICS_SLOWEST slowest pages, written to the CRAWL_METRICS_FILE json file.
+    #
+    # Requests that come back through the middleware chain (splash, redirects, retries) keep
+    # the start time of the first pass, since scrapy copies the meta dict to the new request.
+
+    def __init__(self, stats, filename, slowest):
+        self.stats = stats
+        self.filename = filename
+        self.slowest = slowest
+        self.records = []
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        if not crawler.settings.get('CRAWL_METRICS_FILE'):
+            raise NotConfigured
+        s = cls(crawler.stats, crawler.settings.get('CRAWL_METRICS_FILE'), crawler.settings.getint('CRAWL_METRICS_SLOWEST'))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        request.meta.setdefault('metrics_start', time.time())
+        return None
+
+    def record(self, request, status, size):
+        total = time.time() - request.meta.get('metrics_start', time.time())
+        latency = request.meta.get('download_latency', total)
+        url = request.meta.get('sitemap_url', request.meta.get('splash', {}).get('args', {}).get('url', request.url))
+        self.records += [{'url': url, 'section': url_section(url), 'status': status,
+                          'endpoint': request.meta.get('splash', {}).get('endpoint', 'http'),
+                          'queue': round(max(0.0, total - latency), 4), 'latency': round(latency, 4),
+                          'size': size, 'redirects': len(request.meta.get('redirect_urls', []))}]
+        self.stats.inc_value('metrics/latency', latency, start=0.0)
+        self.stats.inc_value('metrics/queue', max(0.0, total - latency), start=0.0)
+
+    def process_response(self, request, response, spider):
+        self.record(request, response.status, len(response.body))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.record(request, exception.__class__.__name__, 0)
+        return None
+
+    def spider_closed(self, spider):
+        sections = {}
+        for name in sorted(set([rr['section'] for rr in self.records])):
+            records = [rr for rr in self.records if rr['section'] == name]
+            sections[name] = {'count': len(records), 'errors': len([rr for rr in records if not isinstance(rr['status'], int)])}
+            for key in ['queue', 'latency', 'size']:
+                values = sorted([rr[key] for rr in records])
+                sections[name][key] = dict([('p%i' % pp, percentile(values, pp)) for pp in [50, 90, 99]] + [('max', values[-1])])
+            spider.logger.info('%-40s %5i pages  latency p50 %6.2f s  p90 %6.2f s  p99 %6.2f s  queue p90 %6.2f s  size p90 %8i' %
+                               (name, len(records), sections[name]['latency']['p50'], sections[name]['latency']['p90'],
+                                sections[name]['latency']['p99'], sections[name]['queue']['p90'], sections[name]['size']['p90']))
+
+        slowest = sorted(self.records, key=lambda rr: rr['latency'], reverse=True)[:self.slowest]
+        with open(self.filename, 'w') as fid:
+            json.dump({'sections': sections, 'slowest': slowest}, fid, indent=1)
+
+
+class AdaptiveConcurrencyMiddleware:
+    # Adjusts how many splash renders are in flight at once from the render latency splash
+    # is delivering, instead of a fixed CONCURRENT_REQUESTS_PER_DOMAIN.
+    #
+    # Each download slot keeps an exponentially weighted average of its splash latencies and
+    # the lowest average seen so far (the baseline, allowed to creep up slowly). Once per round
+    # (as many responses as the current concurrency) the slot gets one more request in flight
+    # while the average stays within ADAPTIVE_CONCURRENCY_TOLERANCE times the baseline, and a
+    # quarter fewer once it doesn't. Timeouts and 429/503/504 responses halve it right away.
+    # Every change is logged.
+    #
+    # This sits after the SplashMiddleware so it sees the raw splash responses and the timeouts
+    # before the retry middleware does. The global CONCURRENT_REQUESTS still caps everything.
+
+    BACKOFF_STATUS = [429, 503, 504]
+    BACKOFF_EXCEPTIONS = (defer.TimeoutError, TimeoutError, TCPTimedOutError)
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        settings = crawler.settings
+        self.start = settings.getint('ADAPTIVE_CONCURRENCY_START')
+        self.minimum = settings.getint('ADAPTIVE_CONCURRENCY_MIN')
+        self.maximum = settings.getint('ADAPTIVE_CONCURRENCY_MAX')
+        self.tolerance = settings.getfloat('ADAPTIVE_CONCURRENCY_TOLERANCE')
+        self.slots = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('ADAPTIVE_CONCURRENCY'):
+            raise NotConfigured
+        return cls(crawler)
+
+    def slot_key(self, request):
+        return request.meta.get('download_slot', urlparse_cached(request).hostname or '')
+
+    # controller state of a download slot, and the slot itself once the downloader has made it
+    def state(self, request):
+        key = self.slot_key(request)
+        if key not in self.slots:
+            self.slots[key] = {'concurrency': self.start, 'ewma': None, 'baseline': None, 'responses': 0, 'backoff': False}
+        return key, self.slots[key], self.crawler.engine.downloader.slots.get(key)
+
+    def change(self, key, state, concurrency, reason, spider):
+        concurrency = min(self.maximum, max(self.minimum, concurrency))
+        if concurrency != state['concurrency']:
+            spider.logger.info('Concurrency of %s %i -> %i: %s (latency %s s, baseline %s s)' %
+                               (key, state['concurrency'], concurrency, reason,
+                                '%.2f' % state['ewma'] if state['ewma'] is not None else '-',
+                                '%.2f' % state['baseline'] if state['baseline'] is not None else '-'))
+            self.crawler.stats.inc_value('adaptive/%s' % ('increase' if concurrency > state['concurrency'] else 'decrease'))
+            self.crawler.stats.max_value('adaptive/max_concurrency', concurrency)
+        state['concurrency'] = concurrency
+        state['responses'] = 0
+
+    def process_request(self, request, spider):
+        key, state, slot = self.state(request)
+        if slot is not None:
+            slot.concurrency = state['concurrency']
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        if 'splash' not in request.meta:
+            return response
+        key, state, slot = self.state(request)
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if response.status in self.BACKOFF_STATUS:
+            self.backoff(key, state, 'status %i' % response.status, spider)
+        else:
+            latency = request.meta.get('download_latency', 0.0)
+            state['ewma'] = latency if state['ewma'] is None else 0.7 * state['ewma'] + 0.3 * latency
+            state['responses'] += 1
+            if state['responses'] >= state['concurrency']:
+                state['baseline'] = state['ewma'] if state['baseline'] is None else min(state['baseline'] * 1.02, state['ewma'])
+                if state['ewma'] > self.tolerance * state['baseline']:
+                    self.change(key, state, int(state['concurrency'] * 0.75), 'latency degraded', spider)
+                else:
+                    self.change(key, state, state['concurrency'] + 1, 'latency steady', spider)
+                state['backoff'] = False
+
+        if slot is not None:
+            slot.concurrency = state['concurrency']
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+        if ('splash' in request.meta) and isinstance(exception, self.BACKOFF_EXCEPTIONS):
+            key, state, slot = self.state(request)
+            self.backoff(key, state, exception.__class__.__name__, spider)
+            if slot is not None:
+                slot.concurrency = state['concurrency']
+        return None
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    # only once per round, a burst of errors from one overload shouldn't take it to the minimum
+    def backoff(self, key, state, reason, spider):
+        if not state['backoff']:
+            state['backoff'] = True
+            self.change(key, state, state['concurrency'] // 2, reason, spider)
 
-    def spider_opened(self, spider):
-        spider.logger.info('Spider opened: %s' % spider.name)
+
+class SplashPoolMiddleware:
+    # Spreads the splash renders over several splash containers (SPLASH_URLS), each new request
+    # going to the backend with the fewest requests outstanding. Each backend gets its own
+    # download slot, so the concurrency settings (and the AdaptiveConcurrencyMiddleware) apply
+    # per container.
+    #
+    # A backend that fails SPLASH_POOL_MAX_FAILURES times in a row (connection errors, timeouts,
+    # 502/503/504) is left out for SPLASH_POOL_COOLDOWN seconds, and retries of its requests
+    # are moved to another backend. After the cooldown one more failure ejects it again.
+    #
+    # This has to come before the SplashMiddleware, which builds the render request from the
+    # splash_url chosen here.
+
+    FAILURE_STATUS = [502, 503, 504]
+
+    def __init__(self, stats, urls, max_failures, cooldown):
+        self.stats = stats
+        self.urls = urls
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.outstanding = dict([(uu, 0) for uu in urls])
+        self.failures = dict([(uu, 0) for uu in urls])
+        self.ejected = {}
+        self.turn = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        urls = crawler.settings.getlist('SPLASH_URLS')
+        if len(urls) < 2:
+            raise NotConfigured
+        return cls(crawler.stats, urls, crawler.settings.getint('SPLASH_POOL_MAX_FAILURES'),
+                   crawler.settings.getfloat('SPLASH_POOL_COOLDOWN'))
+
+    # least outstanding requests among the healthy backends, taking turns on ties
+    # if every backend is out, the one coming back soonest
+    def choose(self):
+        now = time.time()
+        for url in [uu for uu, until in self.ejected.items() if until <= now]:
+            del self.ejected[url]
+            self.failures[url] = self.max_failures - 1
+        healthy = [uu for uu in self.urls if uu not in self.ejected]
+        if len(healthy) == 0:
+            return min(self.ejected, key=self.ejected.get)
+        self.turn += 1
+        healthy = healthy[self.turn % len(healthy):] + healthy[:self.turn % len(healthy)]
+        return min(healthy, key=lambda uu: self.outstanding[uu])
+
+    def assign(self, request, backend):
+        request.meta['splash_backend'] = backend
+        request.meta['download_slot'] = backend
+        request.meta['_splash_pool_counted'] = True
+        self.outstanding[backend] += 1
+        self.stats.inc_value('splash_pool/requests/%s' % backend)
+
+    def process_request(self, request, spider):
+        if 'splash' not in request.meta:
+            return None
+
+        # a new splash request, the SplashMiddleware will send it to the chosen backend
+        if not request.meta.get('_splash_processed'):
+            if not request.meta.get('_splash_pool_counted'):
+                request.meta['splash']['splash_url'] = self.choose()
+                request.meta['splash']['slot_policy'] = SlotPolicy.SCRAPY_DEFAULT
+                self.assign(request, request.meta['splash']['splash_url'])
+            return None
+
+        # a retry of a render request, moved off its backend if that one has been ejected
+        backend = request.meta.get('splash_backend')
+        if request.meta.get('_splash_pool_counted') or (backend not in self.outstanding):
+            return None
+        if backend in self.ejected:
+            moved = self.choose()
+            if moved != backend:
+                request = request.replace(url=urljoin(moved, request.meta['splash'].get('endpoint', 'render.html')))
+                self.assign(request, moved)
+                return request
+        self.assign(request, backend)
+        return None
+
+    def release(self, request, failed, spider):
+        backend = request.meta.get('splash_backend')
+        if (backend not in self.outstanding) or (not request.meta.pop('_splash_pool_counted', False)):
+            return
+        self.outstanding[backend] -= 1
+        self.failures[backend] = self.failures[backend] + 1 if failed else 0
+        if failed and (self.failures[backend] >= self.max_failures) and (backend not in self.ejected):
+            self.ejected[backend] = time.time() + self.cooldown
+            self.stats.inc_value('splash_pool/ejections')
+            spider.logger.warning('Splash backend %s ejected for %.0f s after %i failures' %
+                                  (backend, self.cooldown, self.failures[backend]))
+
+    def process_response(self, request, response, spider):
+        self.release(request, response.status in self.FAILURE_STATUS, spider)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.release(request, True, spider)
+        return None
@@ -0,0 +1,152 @@
+# Storage for the scraped casadocs pages
+#
+# PAGE_STORE in settings.py picks where the pages go:
+#   a folder (the default 'html') - one html file per page following the path of its url on the site
+#   a file ending in .sqlite      - a single sqlite database with each page zlib compressed, keyed by url
+#
+# both keep the sitemap order of the last crawl and a few json documents (validators, change list)
+# next to the pages, and are shared by the spiders, the page writer pipeline and scripts/convert_html.py
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+
+
+class PageStore:
+    # the pages of the last crawl's sitemap that are in the store, in sitemap order
+    def pages(self):
+        for url in self.order():
+            body = self.get(url)
+            if body is not None:
+                yield url, body
+
+    def put(self, url, body):
+        self.put_many([(url, body)])
+
+
+class FileStore(PageStore):
+    # html/<path after /casadocs-devel/>.html, with the extra documents in html/_<name>.json
+
+    def __init__(self, root):
+        self.root = root
+
+    def filename(self, url):
+        return '%s.html' % '/'.join([self.root] + url.split("/")[4:])
+
+    def get(self, url):
+        if not os.path.exists(self.filename(url)):
+            return None
+        with open(self.filename(url), 'r') as fid:
+            return fid.read()
+
+    def put_many(self, pages):
+        for url, body in pages:
+            os.makedirs(os.path.dirname(self.filename(url)), exist_ok=True)
+            with open(self.filename(url), 'w') as fid:
+                fid.write(body)
+
+    def exists(self, url):
+        return os.path.exists(self.filename(url))
+
+    def delete(self, url):
+        if self.exists(url):
+            os.remove(self.filename(url))
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root)
+
+    def order(self):
+        if not os.path.exists(os.path.join(self.root, '_sitemap.txt')):
+            return []
+        with open(os.path.join(self.root, '_sitemap.txt')) as fid:
+            return fid.read().splitlines()
+
+    def set_order(self, urls):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '_sitemap.txt'), 'w') as fid:
+            fid.write('\n'.join(urls))
+
+    def read_meta(self, name, default=None):
+        if not os.path.exists(os.path.join(self.root, '_%s.json' % name)):
+            return default
+        with open(os.path.join(self.root, '_%s.json' % name)) as fid:
+            return json.load(fid)
+
+    def write_meta(self, name, value):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '_%s.json' % name), 'w') as fid:
+            json.dump(value, fid, indent=1)
+
+
+class SqliteStore(PageStore):
+    # one connection shared by the crawl threads, compression happens outside the lock
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, body BLOB);
+                CREATE TABLE IF NOT EXISTS sitemap (seq INTEGER PRIMARY KEY, url TEXT);
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            """)
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def update(self, sql, rows):
+        with self.lock, self.db:
+            self.db.executemany(sql, rows)
+
+    def get(self, url):
+        rows = self.query('SELECT body FROM pages WHERE url = ?', (url,))
+        return zlib.decompress(rows[0][0]).decode('utf-8') if len(rows) > 0 else None
+
+    def put_many(self, pages):
+        rows = [(url, zlib.compress(body.encode('utf-8'), 6)) for url, body in pages]
+        self.update('INSERT OR REPLACE INTO pages (url, body) VALUES (?, ?)', rows)
+
+    def exists(self, url):
+        return len(self.query('SELECT 1 FROM pages WHERE url = ?', (url,))) > 0
+
+    def delete(self, url):
+        self.update('DELETE FROM pages WHERE url = ?', [(url,)])
+
+    def clear(self):
+        with self.lock, self.db:
+            for table in ['pages', 'sitemap', 'meta']:
+                self.db.execute('DELETE FROM %s' % table)
+
+    def order(self):
+        return [row[0] for row in self.query('SELECT url FROM sitemap ORDER BY seq')]
+
+    def set_order(self, urls):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM sitemap')
+            self.db.executemany('INSERT INTO sitemap (seq, url) VALUES (?, ?)', enumerate(urls))
+
+    def read_meta(self, name, default=None):
+        rows = self.query('SELECT value FROM meta WHERE name = ?', (name,))
+        return json.loads(rows[0][0]) if len(rows) > 0 else default
+
+    def write_meta(self, name, value):
+        self.update('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', [(name, json.dumps(value))])
+
+
+def open_store(path):
+    if path.endswith('.sqlite'):
+        return SqliteStore(path)
+    return FileStore(path)
+
+
+# the spiders, pipelines and extensions of a crawl all share one store
+def crawler_store(crawler):
+    if getattr(crawler, 'page_store', None) is None:
+        crawler.page_store = open_store(crawler.settings.get('PAGE_STORE'))
+    return crawler.page_store
@@ -3,11 +3,112 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import re
+from functools import lru_cache
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+import lxml.html
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+from twisted.internet import defer, threads
 
+from scraper.items import PageItem
+from scraper.pagestore import crawler_store
+
+# relative links from plone pages back up to the shared docs folder
+DOCS_LINK = re.compile(r'(\.\./){4,5}docs/')
+
+# sent once for every page the PageWriterPipeline has written to the page store, with the page's item
+page_saved = object()
+
+
+# all the PRUNE_SELECTORS combined in to one compiled xpath query
+@lru_cache(maxsize=None)
+def prune_query(selectors):
+    translator = HTMLTranslator()
+    return etree.XPath(' | '.join([translator.css_to_xpath(sel, prefix='descendant-or-self::') for sel in selectors]))
+
+
+# clean up the plone html of a page before it is saved
+# the page is parsed once, fixed up in place with a single walk over the tree and serialized once
+def prune_page(body, title, selectors):
+    if len(body.strip()) == 0:
+        return body
+    root = lxml.html.fragment_fromstring(body, create_parent='div')
+
+    # plone folders/pages that list contents need to be removed, they will be replaced by toctrees and their links are bad anyway
+    # and for some reason, mathjax has duplicative information (span.mjx-chtml) that needs to be removed
+    pruned = set(prune_query(tuple(selectors))(root)) if len(selectors) > 0 else set()
+    headings = []
+
+    for element in root.iter():
+        if (not isinstance(element.tag, str)) or (element in pruned):
+            continue
+
+        # the main heading of the page is used later to set the new navigation and page name
+        # sometimes the plone heading differs from the plone navigation tree, and the navigation tree is a better name
+        # so we overwrite the heading with whatever the navigation tree is calling this page (below, once the walk is done)
+        if (element.tag == 'h1') and (element.get('class') == 'documentFirstHeading'):
+            headings += [element]
+
+        # deal with relative links to images
+        for attr in ['src', 'href']:
+            if (element.get(attr) is not None) and ('docs/' in element.get(attr)):
+                element.set(attr, DOCS_LINK.sub('https://casa.nrao.edu/docs/', element.get(attr)))
+
+    # the tree can't change shape while it is being walked
+    # removing a node keeps the text that follows it
+    for element in pruned:
+        element.drop_tree()
+    for element in headings:
+        for child in list(element):
+            element.remove(child)
+        element.text = title
+
+    return (root.text or '') + ''.join([lxml.html.tostring(child, encoding='unicode') for child in root])
+
+
+# runs in a worker thread, one call per batch of pages
+def write_pages(store, items, selectors):
+    store.put_many([(item['url'], prune_page(item['body'], item['title'], selectors)) for item in items])
+    return [item['url'] for item in items]
+
+
+class PageWriterPipeline:
+    # Saves PageItems to the PAGE_STORE. Pages are collected in batches of PAGE_WRITE_BATCH
+    # and each batch is pruned (removing the PRUNE_SELECTORS nodes) and written from the
+    # reactor thread pool, so the html clean up and slow disks don't hold up the crawl.
+    # The page_saved signal is sent for each page once its batch is stored.
+
+    def __init__(self, store, signals, batch_size, selectors):
+        self.store = store
+        self.signals = signals
+        self.batch_size = batch_size
+        self.selectors = selectors
+        self.batch = []
+        self.writes = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler_store(crawler), crawler.signals, max(1, crawler.settings.getint('PAGE_WRITE_BATCH')), crawler.settings.getlist('PRUNE_SELECTORS'))
 
-class ScraperPipeline:
     def process_item(self, item, spider):
+        if not isinstance(item, PageItem):
+            return item
+        self.batch += [item]
+        if len(self.batch) >= self.batch_size:
+            self.flush(spider)
         return item
+
+    def flush(self, spider):
+        batch, self.batch = self.batch, []
+        write = threads.deferToThread(write_pages, self.store, batch, self.selectors)
+        write.addCallback(lambda urls: [spider.log('Saved page %s' % url) for url in urls])
+        write.addCallback(lambda _: [self.signals.send_catch_log(page_saved, item=item, spider=spider) for item in batch])
+        write.addErrback(lambda failure: spider.logger.error('Failed to save pages: %s' % failure.getErrorMessage()))
+        write.addBoth(lambda _: self.writes.discard(write))
+        self.writes.add(write)
+
+    def close_spider(self, spider):
+        if len(self.batch) > 0:
+            self.flush(spider)
+        return defer.DeferredList(list(self.writes))
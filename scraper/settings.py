@@ -14,6 +14,74 @@ NEWSPIDER_MODULE = 'scraper.spiders'
 
 SPLASH_URL = 'http://localhost:8050/'
 
+# more than one splash container can share the rendering, each request going to the one with
+# the fewest requests outstanding (scraper.middlewares.SplashPoolMiddleware), e.g.
+#   SPLASH_URLS = ['http://localhost:8050/', 'http://localhost:8051/', 'http://localhost:8052/']
+# a container failing SPLASH_POOL_MAX_FAILURES times in a row is left out for SPLASH_POOL_COOLDOWN seconds
+SPLASH_URLS = []
+SPLASH_POOL_MAX_FAILURES = 3
+SPLASH_POOL_COOLDOWN = 30
+
+# list of casadocs pages written by the sitemap spider and crawled by the full spider
+SITEMAP_FILE = 'scraper/_sitemap.txt'
+
+# where the scraped pages are saved (see scraper/pagestore.py):
+#   a folder name   - one html file per page, following the url path
+#   a '.sqlite' file - all the pages compressed in to a single database, e.g. 'html.sqlite'
+PAGE_STORE = 'html'
+
+# how the full spider fetches each page:
+#   'splash' - render every page through splash
+#   'auto'   - fetch the plain html first, and only re-fetch through splash when the
+#              page content matches one of the RENDER_SIGNALS (mathjax markup etc)
+RENDER_MODE = 'splash'
+RENDER_SIGNALS = [
+    r'\\\(', r'\\\[', r'\$\$',                   # inline and display latex delimiters
+    r'<script[^>]*type="math/tex',               # mathjax script blocks
+    r'class="[^"]*(MathJax|mjx-|math)[^"]*"',    # already typeset or tagged math
+]
+
+# how long splash waits for each page to finish rendering (see scraper/splash.py):
+#   'fixed'    - always wait SPLASH_WAIT seconds
+#   'adaptive' - poll every SPLASH_POLL_INTERVAL seconds until the dom and mathjax are done,
+#                giving up after SPLASH_MAX_WAIT seconds
+SPLASH_WAIT_MODE = 'fixed'
+SPLASH_WAIT = 2.0
+SPLASH_MAX_WAIT = 10.0
+SPLASH_POLL_INTERVAL = 0.1
+
+# per-page splash render times are written to this csv file at the end of the crawl, off unless set
+# compare the wait modes by crawling once with each and a log file for each, e.g.
+#   scrapy crawl full -s SPLASH_WAIT_MODE=fixed -s SPLASH_RENDER_LOG=renders_fixed.csv
+#   scrapy crawl full -s SPLASH_WAIT_MODE=adaptive -s SPLASH_RENDER_LOG=renders_adaptive.csv
+#SPLASH_RENDER_LOG = 'splash_renders.csv'
+
+# queue time, latency, size, redirects and status of every download, summarized by site section
+# (percentiles) along with the slowest pages, written here at the end of the crawl
+CRAWL_METRICS_FILE = 'crawl_metrics.json'
+CRAWL_METRICS_SLOWEST = 25
+
+# let scraper.middlewares.AdaptiveConcurrencyMiddleware pick how many splash renders run at once
+# starting from ADAPTIVE_CONCURRENCY_START, it adds one while the render latency stays within
+# ADAPTIVE_CONCURRENCY_TOLERANCE times its best level and backs off when it doesn't (or on timeouts / 503s)
+ADAPTIVE_CONCURRENCY = False
+ADAPTIVE_CONCURRENCY_START = 2
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 16
+ADAPTIVE_CONCURRENCY_TOLERANCE = 1.5
+
+# keep the pages from the previous crawl and only fetch pages that are new to the sitemap
+# or whose ETag / Last-Modified changed, pages no longer in the sitemap are deleted
+# the pages that changed are listed in the page store (html/_changes.json) for scripts/convert_html.py
+INCREMENTAL_CRAWL = False
+
+# convert pages with scripts/convert_html.py as they are saved, overlapping pandoc with the crawl
+# (the StreamingConvert extension), using this many conversion threads
+STREAM_CONVERT = False
+CONVERT_WORKERS = 4
+# images of the converted pages are downloaded once in to this folder and reused on later builds
+MEDIA_CACHE = '.media_cache'
+
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = 'scraper (+http://www.yourdomain.com)'
@@ -62,8 +130,11 @@ DUPEFILTER_CLASS = 'scrapy_splash.SplashAwareDupeFilter'
 #    'scraper.middlewares.ScraperDownloaderMiddleware': 543,
 #}
 DOWNLOADER_MIDDLEWARES = {
+    'scraper.middlewares.ScraperDownloaderMiddleware': 543,
+    'scraper.middlewares.SplashPoolMiddleware': 720,
     'scrapy_splash.SplashCookiesMiddleware': 723,
     'scrapy_splash.SplashMiddleware': 725,
+    'scraper.middlewares.AdaptiveConcurrencyMiddleware': 750,
     'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware': 810,
 }
 
@@ -72,12 +143,27 @@ DOWNLOADER_MIDDLEWARES = {
 #EXTENSIONS = {
 #    'scrapy.extensions.telnet.TelnetConsole': None,
 #}
+EXTENSIONS = {
+    'scraper.extensions.SplashRenderLog': 500,
+    'scraper.extensions.StreamingConvert': 510,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 #ITEM_PIPELINES = {
 #    'scraper.pipelines.ScraperPipeline': 300,
 #}
+ITEM_PIPELINES = {
+    'scraper.pipelines.PageWriterPipeline': 300,
+}
+
+# number of scraped pages saved together by each background write
+PAGE_WRITE_BATCH = 20
+
+# css selectors of the plone page elements removed before a page is saved
+#   div.entries      - folder content listings, replaced by toctrees later on
+#   span.mjx-chtml   - mathjax's rendered copy of each equation, the source is kept
+PRUNE_SELECTORS = ['div.entries', 'span.mjx-chtml']
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -1,35 +1,109 @@
+import hashlib
 import scrapy
-from scrapy_splash import SplashRequest
-import os
+from scraper.items import PageItem
+from scraper.pagestore import crawler_store
+from scraper.pipelines import page_saved
+from scraper.splash import splash_request
 import re
 
+
 class CasadocsSpider(scrapy.Spider):
     name = "full"
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.page_saved, signal=page_saved)
+        return spider
+
     def start_requests(self):
-        with open('scraper/_sitemap.txt') as fid:
+        with open(self.settings.get('SITEMAP_FILE')) as fid:
             urls = fid.read().splitlines()
         
-        os.system('rm -fr html')
-        os.system('mkdir html')
+        # an incremental crawl keeps the pages from the last crawl and only fetches what changed since then
+        # the page store also holds the sitemap and validators of the last crawl
+        self.store = crawler_store(self.crawler)
+        previous, self.validators, self.pending = self.store.order(), {}, {}
+        self.incremental = self.settings.getbool('INCREMENTAL_CRAWL') and (len(previous) > 0)
+        if self.incremental:
+            self.validators = self.store.read_meta('validators', {})
+        else:
+            previous = []
+            self.store.clear()
+        
+        # 'splash' renders every page, 'auto' fetches plain html first and only renders the pages that need javascript
+        self.render_mode = self.settings.get('RENDER_MODE')
+        if self.render_mode not in ['splash', 'auto']:
+            raise ValueError('unknown RENDER_MODE %s' % self.render_mode)
+        self.render_signals = re.compile('|'.join(self.settings.getlist('RENDER_SIGNALS')))
+        
+        # pages that dropped out of the sitemap are deleted right away
+        # a full crawl lists every page as added so the change list always describes the html folder
+        self.urls, self.previous = urls, set(previous)
+        self.changes = {'added': [] if self.incremental else list(urls), 'modified': [],
+                        'removed': [uu for uu in previous if uu not in set(urls)]}
+        for url in self.changes['removed']:
+            self.validators.pop(url, None)
+            self.store.delete(url)
         
         for url in urls:
-            #yield scrapy.Request(url=url, callback=self.parse)
-            yield SplashRequest(url, self.parse, endpoint='render.html', args={'wait': 2.0}, )
+            # pages we have seen before are only downloaded again if the server says they changed,
+            # and only rendered and saved again if their content did
+            if self.incremental and (url in self.validators) and self.store.exists(url):
+                headers = {}
+                if self.validators[url].get('etag'):
+                    headers['If-None-Match'] = self.validators[url]['etag']
+                if self.validators[url].get('last_modified'):
+                    headers['If-Modified-Since'] = self.validators[url]['last_modified']
+                yield scrapy.Request(url, self.route, headers=headers, meta={'sitemap_url': url, 'handle_httpstatus_list': [304]})
+            # the plain http request also picks up the validators for the next incremental crawl,
+            # including on the first one, when there is no earlier crawl to compare with yet
+            elif (self.render_mode == 'auto') or self.settings.getbool('INCREMENTAL_CRAWL'):
+                yield scrapy.Request(url, self.route, meta={'sitemap_url': url})
+            else:
+                yield self.splash_request(url)
 
-    def parse(self, response):
-        fpath = ['html'] + response.url.split("/")[4:]
+    def splash_request(self, url, dont_filter=False):
+        return splash_request(url, self.parse, self.settings, meta={'sitemap_url': url}, dont_filter=dont_filter)
+
+    def route(self, response):
+        url = response.meta['sitemap_url']
+        if response.status == 304:
+            self.crawler.stats.inc_value('incremental/unchanged')
+            return None
         
-        # some plone pages have automatic redirects elsewhere, we need to get around that
-        if 'redirect_urls' in response.request.meta.keys():
-            fpath = ['html'] + response.request.meta['redirect_urls'][0].split("/")[4:]
+        # remember what the server said about this version of the page, it is kept once the page is saved
+        # along with a digest of the page content, for servers that send no validators or always answer 200
+        # (only the content counts, the plone template around it changes with the navigation)
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        validators = dict([(kk, vv.decode('latin-1')) for kk, vv in validators.items() if vv is not None])
+        content = ''.join(response.css("#content").getall())
+        validators['digest'] = hashlib.sha1(content.encode('utf-8')).hexdigest()
         
-        for ii in range(1,len(fpath)):
-            if not os.path.isdir('/'.join(fpath[:ii])):
-                os.mkdir('/'.join(fpath[:ii]))
+        # same content as the saved page, nothing to render or save again
+        if self.incremental and (self.validators.get(url, {}).get('digest') == validators['digest']) and self.store.exists(url):
+            self.validators[url] = validators
+            self.crawler.stats.inc_value('incremental/unchanged')
+            return None
+        self.pending[url] = validators
         
-        # filename comes from the url to preserve the sitemap
-        filename = '%s.html' % '/'.join(fpath)
+        if self.render_mode == 'splash':
+            return self.splash_request(url, dont_filter=True)
+        
+        # only look at the page content, the plone template around it may load mathjax on every page
+        if (len(content) > 0) and (self.render_signals.search(content) is None):
+            self.crawler.stats.inc_value('render/http')
+            return self.parse(response)
+
+        # this page needs javascript, fetch it again through splash
+        self.crawler.stats.inc_value('render/splash')
+        return self.splash_request(url, dont_filter=True)
+
+    def parse(self, response):
+        # some plone pages have automatic redirects elsewhere, we need to get around that
+        # so the path always comes from the url we asked for in the sitemap
+        url = response.meta['sitemap_url']
+        fpath = ['html'] + url.split("/")[4:]
         
         # title comes from the navigation tree, can't trust the url or page header
         title = ''.join(response.css("a.navTreeCurrentItem::text").getall()).strip()
@@ -38,30 +112,27 @@ class CasadocsSpider(scrapy.Spider):
         if fpath[-1].startswith('task_') or fpath[-1].startswith('tool_'):
             title = fpath[-1][5:]
             
-        # main HTML of page
+        # main HTML of page, cleaned up and saved by the PageWriterPipeline
+        # stored under the sitemap url
         body = ''.join(response.css("#content").getall())  # .css("#parent-fieldname-text").getall())
         
-        # the main heading of the page is used later to set the new navigation and page name
-        # sometimes the plone heading differs from the plone navigation tree, and the navigation tree is a better name
-        # so here we overwrite the heading with whatever the navigation tree is calling this page
-        body = re.sub('(<h1 class="documentFirstHeading">).*?(</h1>)', r'\g<1>%s\2' % title, body)
-        
-        # deal with relative links to images
-        body = re.sub('\.\./\.\./\.\./\.\./\.\./docs/', 'https://casa.nrao.edu/docs/', body)
-        body = re.sub('\.\./\.\./\.\./\.\./docs/', 'https://casa.nrao.edu/docs/', body)
-        
-        # plone folders/pages that list contents need to be removed, they will be replaced by toctrees and their links are bad anyway
-        entries = response.css('div.entries').getall()
-        if len(entries) > 0:
-            body = body.replace(''.join(entries), '')
-            
-        # for some reason, mathjax has duplicative information that needs to be removed
-        #entries = response.css("span[class*=mjx]").getall()
-        #entries += response.css("span[class*=MJXp]").getall()
-        entries = response.css("span.mjx-chtml").getall()
-        for entry in entries:
-            body = body.replace(entry, '')
+        return PageItem(url=url, title=title, body=body)
+
+    # a page is only listed as changed, and its validators kept, once the PageWriterPipeline has saved it
+    # otherwise a page that failed to save would look unchanged to the next incremental crawl
+    def page_saved(self, item, spider):
+        url = item['url']
+        if url in self.pending:
+            self.validators[url] = self.pending.pop(url)
+        if self.incremental:
+            self.changes['modified' if url in self.previous else 'added'] += [url]
+
+    def closed(self, reason):
+        # snapshot of this crawl for the next incremental one
+        self.store.set_order(self.urls)
+        self.store.write_meta('validators', self.validators)
         
-        with open(filename, 'w') as fid:
-            fid.write(body)
-        self.log('Saved file %s' % filename)
+        # list of the pages that changed in sitemap order, for the html conversion to pick up
+        order = dict([(uu, ii) for ii, uu in enumerate(self.urls + self.changes['removed'])])
+        self.store.write_meta('changes', dict([(kk, sorted(vv, key=order.get)) for kk, vv in self.changes.items()]))
+        self.log('%i pages added, %i modified, %i removed' % tuple([len(self.changes[kk]) for kk in ['added', 'modified', 'removed']]))
@@ -12,6 +12,6 @@ class SitemapSpider(scrapy.Spider):
     def parse(self, response):
         page = response.url.split("/")[-2]
         body = '\n'.join(response.css("#content a::attr(href)").getall())
-        with open('scraper/_sitemap.txt', 'w') as fid:
+        with open(self.settings.get('SITEMAP_FILE'), 'w') as fid:
             fid.write(body)
         self.log('generated _sitemap.txt')
@@ -0,0 +1,59 @@
+# Splash request helpers shared by the spiders
+#
+# SPLASH_WAIT_MODE in settings.py picks how long splash waits on each page:
+#   'fixed'    - the render.html endpoint with a fixed SPLASH_WAIT seconds
+#   'adaptive' - the execute endpoint running RENDER_LUA, which polls the page until the
+#                dom and mathjax are finished (or SPLASH_MAX_WAIT runs out) and returns
+#                right away, along with how long the render took
+
+from scrapy_splash import SplashRequest
+
+
+# true once the document has loaded and mathjax (v2 or v3, if present) has finished typesetting
+READY_JS = """
+function () {
+    if (document.readyState !== 'complete') { return false; }
+    if (typeof MathJax === 'undefined') { return true; }
+    if (MathJax.Hub && MathJax.Hub.queue) {
+        return (MathJax.isReady === true) && (MathJax.Hub.queue.pending === 0) && (MathJax.Hub.queue.running === 0);
+    }
+    if (MathJax.startup && MathJax.startup.promise) {
+        if (!window.casadocsTypesetHook) {
+            window.casadocsTypesetHook = true;
+            MathJax.startup.promise.then(function () { window.casadocsTypeset = true; });
+        }
+        return window.casadocsTypeset === true;
+    }
+    return true;
+}
+"""
+
+RENDER_LUA = """
+function main(splash, args)
+    assert(splash:go(args.url))
+    local ready = splash:jsfunc([[%s]])
+    local waited = 0
+    while (not ready()) and (waited < args.max_wait) do
+        splash:wait(args.poll)
+        waited = waited + args.poll
+    end
+    return {
+        html = splash:html(),
+        url = splash:url(),
+        ready = ready(),
+        waited = waited,
+        render_time = splash:evaljs('performance.now()') / 1000,
+    }
+end
+""" % READY_JS
+
+
+def splash_request(url, callback, settings, **kwargs):
+    if settings.get('SPLASH_WAIT_MODE') == 'adaptive':
+        args = {'lua_source': RENDER_LUA,
+                'max_wait': settings.getfloat('SPLASH_MAX_WAIT'),
+                'poll': settings.getfloat('SPLASH_POLL_INTERVAL')}
+        return SplashRequest(url, callback, endpoint='execute', args=args, cache_args=['lua_source'], **kwargs)
+    elif settings.get('SPLASH_WAIT_MODE') == 'fixed':
+        return SplashRequest(url, callback, endpoint='render.html', args={'wait': settings.getfloat('SPLASH_WAIT')}, **kwargs)
+    raise ValueError('unknown SPLASH_WAIT_MODE %s' % settings.get('SPLASH_WAIT_MODE'))
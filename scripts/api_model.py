@@ -0,0 +1,112 @@
+##################################################################################
+# the parsed task and tool xml, as parse_task_xml.py and parse_tool_xml.py hand it
+# to the code writing the stubs and api pages
+#
+# only the fields the pages use are kept, in __slots__ so the thousand or so tool
+# methods and their params stay small, and the strings that are used over and over
+# (a param's signature, a param's subparameters) are worked out once
+##################################################################################
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class Param:
+    __slots__ = ('name', 'type', 'value', 'mustexist', 'subparam', 'shortdescription', 'description', 'link', '_spec', '_default')
+    name: str
+    type: str
+    value: Optional[str]
+    mustexist: Optional[str]    # as written in the xml
+    subparam: bool
+    shortdescription: Optional[str]
+    description: Optional[str]
+    link: bool                  # task params are written as name_, a link to their details
+
+    def __post_init__(self):
+        self._spec = None
+        self._default = None
+
+    # no default value in the prototype, these come first
+    @property
+    def required(self):
+        return self.mustexist == 'true'
+
+    @property
+    def optional(self):
+        return self.mustexist in [None, 'false']
+
+    # name (type=default), as listed in the docstrings
+    @property
+    def spec(self):
+        if self._spec is None:
+            name = self.name + '_' if self.link else self.name
+            ptype = '{%s}' % self.type if len(self.type.split(', ')) > 1 else self.type
+            self._spec = '%s (%s=\'\')' % (name, ptype)
+
+            # must exist params don't have default values
+            if self.required:
+                self._spec = '%s (%s)' % (name, ptype)
+            elif self.value is not None:
+                if (('string' in self.type.split(', ')) or ('variant' in ptype)) and (not self.value.startswith('\'')):
+                    self._spec = '%s (%s=\'%s\')' % (name, ptype, self.value.strip())
+                else:
+                    self._spec = '%s (%s=%s)' % (name, ptype, self.value.strip())
+        return self._spec
+
+    # =default, as it goes in the prototype
+    @property
+    def default(self):
+        if self._default is None:
+            self._default = self.spec[self.spec.rindex('='):-1]
+        return self._default
+
+
+# the arguments of a function prototype, params with no default first
+def prototype(params):
+    required = [pp.name for pp in params.values() if pp.required]
+    return ', '.join(required + ['%s%s' % (pp.name, pp.default) for pp in params.values() if pp.optional])
+
+
+@dataclass
+class Task:
+    __slots__ = ('name', 'category', 'shortdescription', 'description', 'params', 'subparams')
+    name: str
+    category: str
+    shortdescription: Optional[str]
+    description: Optional[str]
+    params: Dict[str, Param]
+    subparams: Dict[str, Dict[str, Dict[str, List[str]]]]    # param -> condition (e.g. "mode = auto") -> subparam -> values
+
+    def add_condition(self, param, condition, subparams):
+        self.subparams.setdefault(param, {})[condition] = subparams
+
+    # the conditions on a param's value and the subparameters each of them brings in
+    def conditions(self, param):
+        return self.subparams.get(param, {})
+
+    def args(self):
+        return prototype(self.params)
+
+
+@dataclass
+class Method:
+    __slots__ = ('name', 'shortdescription', 'description', 'params', 'returns', 'examples')
+    name: str
+    shortdescription: Optional[str]
+    description: Optional[str]
+    params: Dict[str, Param]
+    returns: Optional[str]
+    examples: Optional[str]
+
+    def args(self):
+        return prototype(self.params)
+
+
+@dataclass
+class Tool:
+    __slots__ = ('name', 'shortdescription', 'description', 'methods')
+    name: str
+    shortdescription: str
+    description: str
+    methods: Dict[str, Method]
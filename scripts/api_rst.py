@@ -0,0 +1,105 @@
+##################################################################################
+# reST for the api reference pages, written straight from the parsed task and
+# tool xml by parse_task_xml.py --rst and parse_tool_xml.py --rst
+#
+# each page in api/tt holds what automodsumm + autodoc would have made from the
+# python stubs: the same page names, the same casatasks.* / casatools.* objects
+# and the same docstrings, so cross references and anchors don't change
+#
+# the summary tables on the api pages come from the first paragraph of each
+# docstring, kept in an index (api/tt/_<name>.json) that docs/_ext/apirst.py
+# reads in place of importing the stubs
+##################################################################################
+
+import json
+import os
+from sphinx.util.docstrings import prepare_docstring
+
+TT = 'api/tt/'
+
+
+# the lines of a docstring as autodoc passes them on to sphinx
+def docstring(text):
+    return prepare_docstring(text)
+
+
+def indent(lines, depth):
+    return ''.join([(' ' * depth + ll).rstrip() + '\n' for ll in lines])
+
+
+# first paragraph of a docstring, what autosummary takes the summary from
+def summary(lines):
+    return lines[:lines.index('')] if '' in lines else lines
+
+
+def title(name):
+    return name + '\n' + '=' * len(name) + '\n\n'
+
+
+# module.name(args) page
+def function_page(module, name, args, lines):
+    return title(name) + '.. currentmodule:: %s\n\n.. function:: %s(%s)\n\n' % (module, name, args) + indent(lines, 3)
+
+
+# module.name page with each of its (method, args, lines) after the class docstring
+# like the tooldoc.rst template, the methods are documented from within module.name,
+# so their objects are module.name.name.method
+#
+# with pages=True the methods go on their own pages (method_page) instead, listed in
+# the summary table, so a tool with hundreds of methods isn't one huge page
+def class_page(module, name, lines, methods, pages=False):
+    text = title(name) + '.. currentmodule:: %s\n\n.. class:: %s\n\n' % (module, name) + indent(lines, 3)
+    if len(methods) > 0:
+        text += '\n   .. rubric:: Methods Summary\n\n   .. apisummary:: %s.%s\n      :nosignatures:\n' % (module, name)
+        text += '      :toctree: .\n\n' if pages else '\n   .. currentmodule:: %s.%s\n\n' % (module, name)
+        for method, args, mlines in ([] if pages else methods):
+            text += '\n   .. method:: %s(%s)\n\n' % (method, args) + indent(mlines, 6)
+    return text
+
+
+# module.name.name.method page of a tool split with class_page(pages=True), same object as on the class page
+def method_page(module, name, method, args, lines):
+    return title(name + '.' + method) + '.. currentmodule:: %s.%s\n\n.. method:: %s.%s(%s)\n\n' % (module, name, name, method, args) + indent(lines, 3)
+
+
+def write_page(fname, text):
+    with open(TT + fname + '.rst', 'w') as fid:
+        fid.write(text)
+
+
+# remove the pages of the given modules (and their index) before they are written again,
+# or before automodsumm writes its own (it leaves existing pages alone)
+# pages starting with one of the keep prefixes are left in place
+def clean(modules, index, keep=()):
+    os.makedirs(TT, exist_ok=True)
+    for fname in os.listdir(TT):
+        if fname.endswith('.rst') and (fname.split('.')[0] in modules) and (not fname.startswith(tuple(keep))):
+            os.remove(TT + fname)
+    if os.path.exists(TT + '_%s.json' % index):
+        os.remove(TT + '_%s.json' % index)
+
+
+# remove one object's pages, e.g. a tool's class page and its method pages when just that tool is written again
+def remove(name):
+    for fname in os.listdir(TT):
+        if fname == name + '.rst' or fname.startswith(name + '.'):
+            os.remove(TT + fname)
+
+
+# index is {module: [[display name, object name, summary lines], ...]}, listed in name order
+def read_index(name):
+    if not os.path.exists(TT + '_%s.json' % name):
+        return {}
+    with open(TT + '_%s.json' % name) as fid:
+        return json.load(fid)
+
+
+# add (or replace) the entry of one object in its module's list
+def add_entry(index, module, entry):
+    index[module] = [ee for ee in index.get(module, []) if ee[0] != entry[0]] + [entry]
+
+
+def write_index(name, index):
+    index = dict([(mm, sorted(ee)) for mm, ee in index.items()])
+    with open(TT + '_%s.json' % name, 'w') as fid:
+        json.dump(index, fid, indent=1)
@@ -0,0 +1,214 @@
+##################################################################################
+# docstrings and python stubs of the tasks and tools, for parse_task_xml.py and
+# parse_tool_xml.py
+#
+# the layout of each one is a jinja2 template (jinja2 comes with sphinx). they are
+# compiled once and the compiled code is kept in __pycache__/jinja, so later runs
+# only load it. a stub module is rendered whole and written with one write, rather
+# than built up a piece at a time
+#
+# the docstrings are the same text in both modes, --rst turns them in to api pages
+# (api_rst.py) instead of stubs
+##################################################################################
+
+import os
+import re
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, StrictUndefined
+
+TEMPLATES = {}
+
+# task docstring: summary, section links, parameters with their subparameters under each
+# condition, the Plone description and the details of each parameter
+TEMPLATES['task_doc'] = ('''
+{% if task.shortdescription is not none %}
+{{ task.shortdescription }}
+
+{% elif task.description is not none %}
+{{ task.description | oneline }}
+
+{% else %}
+{{ ' ' }}
+
+{% endif %}
+{% if text | length > 0 %}
+[`Description`_] [`Examples`_] [`Development`_] [`Details`_]
+
+{% endif %}
+
+Parameters
+{% for param in task.params.values() if not param.subparam %}
+   - {{ param | spec_line }}
+{% for condition, subparams in task.conditions(param.name).items() %}
+{% if subparams | length > 0 %}
+
+      .. raw:: html
+
+         <details><summary><i> {{ condition }} </i></summary>
+
+{% endif %}
+{% for name in subparams if name in task.params %}
+      - {{ task.params[name] | spec_line }}
+{% endfor %}
+{% if subparams | length > 0 %}
+
+      .. raw:: html
+
+         </details>
+{% endif %}
+{% endfor %}
+{% endfor %}
+
+
+{{ text }}
+
+.. _Details:
+
+
+Parameter Details
+   Detailed descriptions of each function parameter
+
+{% for param in task.params.values() if param.description is not none %}
+.. _{{ param.name }}:
+
+| ``{{ param.spec | replace('_ ', ' ') }}`` - {{ param.description | details }}
+
+{% endfor %}
+
+    ''')
+
+TEMPLATES['task_stub'] = ('''#
+# stub function definition file for docstring parsing
+#
+
+def {{ name }}({{ args }}):
+    r"""{{ doc }}"""
+    pass
+''')
+
+# tool class docstring, and the docstring of a method with or without parameters
+TEMPLATES['class_doc'] = ('''
+    {{ summary | nl_indent(4) }}
+
+{% if description is not none %}
+    {{ description | nl_indent(4) }}
+
+{% endif %}
+    ''')
+
+TEMPLATES['method_doc'] = ('''
+{{ desc }}
+
+        .. rubric:: Parameters
+
+{% for spec, description in params %}
+        - ``{{ spec }}``{{ ' - ' ~ description if description is not none else '' }}
+{% endfor %}
+{% if returns is not none %}
+
+
+        .. rubric:: Returns
+
+        ``{{ returns }}``
+
+{% endif %}
+{% if examples is not none %}
+        .. rubric:: Examples
+
+        ::
+
+           {{ examples | nl_indent(11) }}
+{% else %}
+
+{% endif %}
+        ''')
+
+TEMPLATES['empty_method_doc'] = ('''
+{{ desc }}
+
+        ''')
+
+TEMPLATES['tool_stub'] = ('''#
+# stub class definition file for docstring parsing
+#
+
+class {{ name }}:
+    r"""{{ cdoc }}"""
+
+{% for method, args, mdoc, params in methods %}
+{% if params %}
+    def {{ method }}(self, {{ args }}):
+        r"""{{ mdoc }}"""
+
+        pass
+
+
+{% else %}
+    def {{ method }}(self):
+        r"""{{ mdoc }}"""
+
+        pass
+
+{% endif %}
+{% endfor %}
+''')
+
+TEMPLATES['init'] = ('''{% for name in names %}
+from .{{ name }} import *
+{% endfor %}
+''')
+
+# compiled templates are cached next to the python ones
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__', 'jinja')
+os.makedirs(CACHE, exist_ok=True)
+ENV = Environment(loader=DictLoader(TEMPLATES), bytecode_cache=FileSystemBytecodeCache(CACHE), trim_blocks=True,
+                  lstrip_blocks=True, keep_trailing_newline=True, undefined=StrictUndefined)
+ENV.filters['nl_indent'] = lambda text, depth: text.replace('\n', '\n' + ' ' * depth)
+ENV.filters['oneline'] = lambda text: re.sub(r'\s+', ' ', text.strip(), flags=re.DOTALL)
+ENV.filters['details'] = lambda text: re.sub('\n+', '\n|    ', text.strip(), flags=re.DOTALL)
+ENV.filters['spec_line'] = lambda param: param.spec + (' - %s' % param.shortdescription if (param.shortdescription is not None) and
+                                                       (len(param.shortdescription.strip()) > 0) else '')
+
+TASK_DOC = ENV.get_template('task_doc')
+TASK_STUB = ENV.get_template('task_stub')
+CLASS_DOC = ENV.get_template('class_doc')
+METHOD_DOC = ENV.get_template('method_doc')
+EMPTY_METHOD_DOC = ENV.get_template('empty_method_doc')
+TOOL_STUB = ENV.get_template('tool_stub')
+INIT = ENV.get_template('init')
+
+
+# everything between the quotes of a task stub, text is the Plone description (rst)
+def task_doc(task, text):
+    return TASK_DOC.render(task=task, text=text)
+
+
+def task_stub(name, args, doc):
+    return TASK_STUB.render(name=name, args=args, doc=doc)
+
+
+# summary and description are already cleaned up, the description (rst) is left out if None
+def class_doc(summary, description=None):
+    return CLASS_DOC.render(summary=summary, description=description)
+
+
+# desc is the indented method description, params a list of (spec, description or None),
+# or None if the method takes no parameters at all
+def method_doc(desc, params, returns=None, examples=None):
+    if params is None:
+        return EMPTY_METHOD_DOC.render(desc=desc)
+    return METHOD_DOC.render(desc=desc, params=params, returns=returns, examples=examples)
+
+
+# methods is a list of (method, args, docstring, whether it has parameters)
+def tool_stub(name, cdoc, methods):
+    return TOOL_STUB.render(name=name, cdoc=cdoc, methods=methods)
+
+
+# __init__.py importing each of the names
+def init(names):
+    return INIT.render(names=names)
+
+
+def write(fname, text):
+    with open(fname, 'w') as fid:
+        fid.write(text)
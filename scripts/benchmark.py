@@ -0,0 +1,132 @@
+##################################################################################
+# times each stage of the docs pipeline on a synthetic corpus (benchmark_corpus.py)
+#
+#   python scripts/benchmark.py [--scale 1] [--repeat 3] [--stages parse_task_xml,...]
+#                               [--save] [--threshold 0.25] [--baseline file]
+#
+# the corpus is written to a temporary folder laid out like this repository, and each
+# stage runs the real script there as its own process, the way buildme.sh does it.
+# for each stage the median wall time over the repeats, the throughput and the peak
+# memory (max rss) of the process are reported
+#
+# the results are compared to the baseline (scripts/benchmark_baseline.json by default,
+# written with --save, made at the same scale on the same machine). a stage more than
+# --threshold slower or larger than its baseline is a regression, and the exit status is 1
+#
+# convert_html.py needs pandoc, and parse_tool_xml.py downloads it first, so those two
+# stages only run where the full build does
+##################################################################################
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import benchmark_corpus
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# name, script and arguments, folder it runs in, the corpus count it gets through, files removed before each run
+STAGES = [('convert_html', ['convert_html.py', '--media-cache', ''], 'convert', 'pages', []),
+          ('build_notebooks', ['build_notebooks.py'], '.', 'notebook pages', []),
+          ('parse_task_xml', ['parse_task_xml.py'], 'docs', 'tasks', []),
+          ('parse_task_xml --rst', ['parse_task_xml.py', '--rst'], 'docs', 'tasks', []),
+          ('parse_tool_xml', ['parse_tool_xml.py'], 'docs', 'methods', []),
+          ('parse_tool_xml --rst', ['parse_tool_xml.py', '--rst'], 'docs', 'methods', []),
+          ('parse_pull_requests', ['parse_pull_requests.py'], 'docs', 'prs', ['changelog/_rendered.json'])]
+
+
+# runs one stage, returns the wall time, peak memory in MB and the end of stderr if it failed
+def run(args, cwd, reset):
+    for fname in reset:
+        if os.path.exists(os.path.join(cwd, fname)):
+            os.remove(os.path.join(cwd, fname))
+    with tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, args[0])] + args[1:], cwd=cwd,
+                                stdout=subprocess.DEVNULL, stderr=err)
+        pid, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+        proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+        err.seek(0)
+        error = err.read().decode(errors='replace').strip().split('\n')[-1] if proc.returncode != 0 else None
+    return seconds, usage.ru_maxrss / 1024.0, error
+
+
+# the convert stage gets its own folder, it starts by clearing docs/tasks and docs/tools
+def workspace(root, scale, seed):
+    items = benchmark_corpus.generate(root, scale, seed)
+    os.makedirs(os.path.join(root, 'convert', 'docs'))
+    for name in ['html', 'scraper']:
+        os.symlink(os.path.join(root, name), os.path.join(root, 'convert', name))
+    return items
+
+
+def compare(result, base, threshold):
+    if base is None:
+        return '', False
+    slower = result['seconds'] / base['seconds'] - 1 if base['seconds'] > 0 else 0
+    larger = result['peak_mb'] / base['peak_mb'] - 1 if base['peak_mb'] > 0 else 0
+    regressed = (slower > threshold) or (larger > threshold)
+    return '%+6.1f%% time %+6.1f%% mem%s' % (100 * slower, 100 * larger, '  REGRESSION' if regressed else ''), regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time the docs pipeline stages on a synthetic corpus')
+    parser.add_argument('--scale', type=float, default=1.0, help='corpus size, 1 is about the real documentation')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage, the median is reported')
+    parser.add_argument('--stages', default=None, help='comma separated stages to run, all by default')
+    parser.add_argument('--baseline', default=os.path.join(SCRIPTS, 'benchmark_baseline.json'), help='baseline results file')
+    parser.add_argument('--save', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slow down / growth over the baseline')
+    parser.add_argument('--keep', default=None, help='build the corpus in this folder and leave it there')
+    args = parser.parse_args()
+
+    stages = [ss for ss in STAGES if (args.stages is None) or (ss[0] in args.stages.split(','))]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fid:
+            baseline = json.load(fid)
+        if baseline.get('scale') != args.scale:
+            print('baseline is for scale %s, not comparing' % baseline.get('scale'))
+            baseline = {}
+
+    root = args.keep if args.keep is not None else tempfile.mkdtemp(prefix='casadocs-bench-')
+    start = time.time()
+    items = workspace(root, args.scale, args.seed)
+    print('corpus: %s (%.1fs)' % (', '.join(['%i %s' % (items[kk], kk) for kk in items]), time.time() - start))
+
+    results, regressions, failures = {}, [], []
+    print('%-22s %8s %9s %10s %9s' % ('stage', 'items', 'seconds', 'items/s', 'peak MB'))
+    for name, script, cwd, count, reset in stages:
+        runs = [run(script, os.path.join(root, cwd), reset) for ii in range(args.repeat)]
+        if runs[-1][2] is not None:
+            print('%-22s failed: %s' % (name, runs[-1][2]))
+            failures += [name]
+            continue
+        seconds = statistics.median([rr[0] for rr in runs])
+        results[name] = {'items': items[count], 'seconds': round(seconds, 4), 'peak_mb': round(max([rr[1] for rr in runs]), 1)}
+        change, regressed = compare(results[name], baseline.get('stages', {}).get(name), args.threshold)
+        print('%-22s %8i %9.3f %10.1f %9.1f  %s' % (name, items[count], seconds, items[count] / seconds, results[name]['peak_mb'], change))
+        if regressed:
+            regressions += [name]
+
+    if args.keep is None:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.save:
+        with open(args.baseline, 'w') as fid:
+            json.dump({'scale': args.scale, 'python': platform.python_version(), 'machine': platform.node(),
+                       'stages': dict(list(baseline.get('stages', {}).items()) + list(results.items()))}, fid, indent=1)
+        print('baseline saved to %s' % args.baseline)
+
+    if len(regressions) > 0:
+        print('regressions over %i%%: %s' % (100 * args.threshold, ', '.join(regressions)))
+    sys.exit(1 if len(regressions) + len(failures) > 0 else 0)
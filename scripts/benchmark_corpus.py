@@ -0,0 +1,245 @@
+##################################################################################
+# synthetic inputs for scripts/benchmark.py, shaped like the real ones:
+#   plone pages     - html/ page store with boxes, citation tables, mathjax and internal links
+#   markdown        - the markdown/ tree convert_html.py leaves for build_notebooks.py
+#   task / tool xml - the casasource folders with params, subparameter constraints and methods
+#   descriptions    - docs/tasks/task_<name>.rst and docs/tools/tool_<name>.rst
+#   changelog       - docs/changelog/pullrequests.txt, dates.txt and builds.txt
+#
+# everything is made from a seeded random generator, so a given scale always gives the
+# same corpus. scale 1 is about the size of the real documentation
+##################################################################################
+
+import json
+import os
+import random
+
+ROOT_URL = 'https://casa.nrao.edu/casadocs-devel/stable'
+NS = 'http://casa.nrao.edu/schema/psetTypes.html'
+
+# counts at scale 1
+SIZES = {'sections': 20, 'subpages': 9, 'tasks': 150, 'params': 35, 'tools': 60, 'methods': 20, 'prs': 3000}
+
+CATEGORIES = ['calibration', 'imaging', 'analysis', 'data', 'flagging', 'information', 'manipulation',
+              'simulation', 'single dish', 'visualization', 'utility']
+TYPES = ['string', 'int', 'double', 'bool', 'stringArray', 'intArray', 'doubleArray', 'variant', 'record', 'any']
+COMPONENTS = ['Calibration', 'Imaging', 'Single Dish', 'Flagging', 'Tools', 'Verification', 'Visualization']
+
+WORDS = ('the data are calibrated with gain solutions for each antenna and spectral window so the visibility '
+         'amplitudes phases image cube model field source channel frequency baseline weight flag table '
+         'polarization bandpass selection parameter solution interval reference integration time').split()
+
+
+def counts(scale):
+    return dict([(kk, max(1, int(round(vv * scale)))) if kk in ['sections', 'tasks', 'tools', 'prs'] else (kk, vv)
+                 for kk, vv in SIZES.items()])
+
+
+def words(rng, n):
+    return ' '.join([rng.choice(WORDS) for ii in range(n)])
+
+
+def sentence(rng):
+    text = words(rng, rng.randint(8, 20))
+    return text[0].upper() + text[1:] + '.'
+
+
+def paragraph(rng, n=4):
+    return ' '.join([sentence(rng) for ii in range(n)])
+
+
+def write(fname, text):
+    os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+    with open(fname, 'w') as fid:
+        fid.write(text)
+
+
+##################################################################################
+# plone html, as the scraper stores it
+def plone_page(rng, title, links):
+    body = '<h1 class="documentFirstHeading">%s</h1>\n' % title
+    for ss in range(rng.randint(3, 7)):
+        body += '<h2>%s</h2>\n<p>%s <a href="%s">%s</a> <span class="math">\\(\\sigma_{%i} = \\sqrt{w}\\)</span>' % (
+            words(rng, 3).title(), paragraph(rng), rng.choice(links), words(rng, 2), ss)
+        body += ' <a href="#cit%i" class="citation">[%i]</a></p>\n' % (ss + 1, ss + 1)
+        body += '<div class="casa-input-box"><pre># In CASA\ntclean(vis=\'%s.ms\', niter=%i)</pre></div>\n' % (words(rng, 1), rng.randint(0, 1000))
+        if rng.random() < 0.5:
+            body += '<div class="alert-box"><p>%s</p></div>\n' % sentence(rng)
+        if rng.random() < 0.5:
+            body += '<div class="info-box"><p>%s</p></div>\n' % sentence(rng)
+        body += '<h3>%s</h3>\n<p>%s</p>\n<p>$$ V_{ij} = g_i g_j^* \\int I(l,m) e^{-2\\pi i (u l + v m)} dl\\,dm $$</p>\n' % (
+            words(rng, 2).title(), paragraph(rng, 6))
+        body += '<div class="table-wrap"><table><tr><th>Parameter</th><th>Value</th></tr>%s</table></div>\n' % ''.join(
+            ['<tr><td><span style="color: #000">%s</span></td><td>%i</td></tr>' % (words(rng, 1), rng.randint(0, 99)) for rr in range(4)])
+    body += '<div id="citation-title">Bibliography</div>\n<div>' + ''.join(
+        ['<div>^%i. %s <a href="#ref-cit%i">↩</a></div>' % (ii + 1, sentence(rng), ii + 1) for ii in range(3)]) + '</div>\n'
+    body += '<table class="citation-table"><tr><td>Citation Number</td><td>1</td></tr></table>\n'
+    return '<html><head><title>%s</title></head><body><div id="content">%s</div></body></html>\n' % (title, body)
+
+
+# the sitemap, with the page urls of the notebooks and the global task / tool lists
+def sitemap(sizes, tasks, tools):
+    urls = [ROOT_URL]
+    for ss in range(sizes['sections']):
+        urls += ['%s/section-%i' % (ROOT_URL, ss)] + ['%s/section-%i/page-%i' % (ROOT_URL, ss, pp) for pp in range(sizes['subpages'])]
+    urls += ['%s/global-task-list' % ROOT_URL]
+    for name in tasks:
+        urls += ['%s/global-task-list/task_%s' % (ROOT_URL, name) + suffix for suffix in ['', '/examples', '/developer']]
+    urls += ['%s/global-tool-list' % ROOT_URL]
+    for name in tools:
+        urls += ['%s/global-tool-list/tool_%s' % (ROOT_URL, name) + suffix for suffix in ['', '/examples', '/developer']]
+    return urls
+
+
+def html_store(rng, root, urls):
+    links = [uu for uu in urls if 'global-t' not in uu][1:]
+    for url in urls:
+        path = '%s.html' % '/'.join([root] + url.split('/')[4:])
+        title = url.split('/')[-1].replace('-', ' ').title()
+        write(path, plone_page(rng, title, links) if not url.endswith('-list') else '<html><body></body></html>\n')
+    write(os.path.join(root, '_sitemap.txt'), '\n'.join(urls))
+
+
+##################################################################################
+# markdown tree, as convert_html.py leaves it
+def markdown_page(rng, title, links):
+    md = '# %s\n\n%s\n\n' % (title, paragraph(rng))
+    for ss in range(rng.randint(3, 7)):
+        md += '## %s\n\n%s [%s](%s)\n\n' % (words(rng, 3).title(), paragraph(rng), words(rng, 2), rng.choice(links))
+        md += '```\n# In CASA\ntclean(vis=\'%s.ms\')\n```\n\n' % words(rng, 1)
+        md += '### %s\n\n%s\n\n<div class="alert alert-info">%s</div>\n\n' % (words(rng, 2).title(), paragraph(rng, 6), sentence(rng))
+        md += '#### %s\n\n%s\n\n![%s](media/figure%i.png)\n\n>%s\n\n' % (words(rng, 2).title(), paragraph(rng), words(rng, 1), ss, sentence(rng))
+    return md
+
+
+def markdown_tree(rng, root, urls):
+    pages = [uu for uu in urls if ('global-t' not in uu) and (uu != ROOT_URL)]
+    links = ['%s.ipynb#%s' % (uu.split('/')[5], uu.split('/')[-1]) for uu in pages]
+    for url in pages:
+        write('/'.join([root] + url.split('/')[5:]) + '.md', markdown_page(rng, url.split('/')[-1].replace('-', ' ').title(), links))
+    write(os.path.join(root, 'index.rst'), 'Description\n\n%s\n' % paragraph(rng))
+    os.makedirs(os.path.join(root, '_media'), exist_ok=True)
+
+
+##################################################################################
+# task xml with parameters, some of them subparameters of another one's value
+def param_xml(rng, name, subparam=False):
+    ptype = rng.choice(TYPES)
+    attrs = 'type="%s" name="%s"' % (ptype, name)
+    attrs += ' subparam="true"' if subparam else (' mustexist="true"' if rng.random() < 0.05 else '')
+    xml = '<param %s>\n<shortdescription>%s</shortdescription>\n<description>%s\ndefault: none\nexample: %s=\'%s\'</description>\n' % (
+        attrs, words(rng, 5).capitalize(), paragraph(rng, 2), name, words(rng, 1))
+    if ptype == 'any':
+        xml += '<any type="string stringArray int"/>\n<value type="string">%s</value>\n' % words(rng, 1)
+    elif ptype.endswith('Array'):
+        xml += '<value>%s</value>\n' % ''.join(['<value>%i</value>' % rng.randint(0, 9) for ii in range(rng.randint(0, 3))])
+    elif ptype in ['int', 'double']:
+        xml += '<value>%s</value>\n' % rng.randint(0, 1000)
+    elif ptype == 'bool':
+        xml += '<value>%s</value>\n' % rng.choice(['true', 'false'])
+    else:
+        xml += '<value>%s</value>\n' % words(rng, 1)
+    return xml + '</param>\n'
+
+
+def task_xml(rng, name, category, nparams):
+    params = ['%s%i' % (rng.choice(WORDS), ii) for ii in range(nparams)]
+    parents = params[:nparams // 3]
+    subs = dict([(pp, params[nparams // 3 + 2 * ii:nparams // 3 + 2 * ii + 2]) for ii, pp in enumerate(parents)])
+    xml = '<?xml version="1.0" encoding="UTF-8"?>\n<casaxml xmlns="%s">\n' % NS
+    xml += '<task type="function" name="%s" category="%s">\n<shortdescription>%s</shortdescription>\n<description>%s</description>\n<input>\n' % (
+        name, category, sentence(rng), paragraph(rng))
+    xml += ''.join([param_xml(rng, pp, pp in sum(subs.values(), [])) for pp in params])
+    xml += '<constraints>\n'
+    for parent in parents:
+        xml += '<when param="%s">\n<equals value="%s">\n%s</equals>\n<notequals value="">\n%s</notequals>\n</when>\n' % (
+            parent, words(rng, 1), ''.join(['<default param="%s"><value>%i</value></default>\n' % (ss, rng.randint(0, 9)) for ss in subs[parent]]),
+            ''.join(['<default param="%s"><value></value></default>\n' % ss for ss in subs[parent][:1]]))
+    return xml + '</constraints>\n</input>\n<returns>void</returns>\n</task>\n</casaxml>\n'
+
+
+# tool xml with methods in latex-ish descriptions, the way the casatools xml has them
+def tool_xml(rng, name, nmethods):
+    xml = '<?xml version="1.0" encoding="UTF-8"?>\n<casaxml xmlns="%s">\n<tool name="%s" module="%s">\n' % (NS, name, name)
+    xml += '<shortdescription>%s</shortdescription>\n<description>%s \\textbf{%s} with data_sets.</description>\n' % (sentence(rng), paragraph(rng), name)
+    for mm in range(nmethods):
+        xml += '<method type="function" name="%s%i">\n<shortdescription>%s</shortdescription>\n<description>%s \\textit{%s}.</description>\n<input>\n' % (
+            rng.choice(WORDS), mm, sentence(rng), paragraph(rng, 2), words(rng, 1))
+        xml += ''.join([param_xml(rng, '%s%i' % (rng.choice(WORDS), pp)) for pp in range(rng.randint(0, 8))])
+        xml += '</input>\n<returns type="%s"/>\n<example>\n%s.open(\'x.im\')\n%s.done()\n</example>\n</method>\n' % (rng.choice(['bool', 'record', 'int']), name, name)
+    return xml + '</tool>\n</casaxml>\n'
+
+
+# task / tool description rst, as convert_html.py writes it
+def description_rst(rng):
+    rst = ''
+    for head in ['Description', 'Examples', 'Development']:
+        rst += '\n\n.. _%s:\n\n%s\n   ' % (head, head)
+        rst += '\n   '.join([paragraph(rng) + '\n' for pp in range(rng.randint(2, 6))])
+        rst += '\n   ::\n\n      tclean(vis=\'%s.ms\', imagename=\'%s\')\n\n   ' % (words(rng, 1), words(rng, 1))
+    return rst
+
+
+def task_names(sizes):
+    return ['task%03i' % ii for ii in range(sizes['tasks'])]
+
+
+def tool_names(sizes):
+    return ['tool%03i' % ii for ii in range(sizes['tools'])]
+
+
+# casasource/ and docs/ under root, as parse_task_xml.py and parse_tool_xml.py expect them
+# returns the number of tool methods
+def xml_tree(rng, root, sizes):
+    tasks = task_names(sizes)
+    folders = ['casasource/casa6/casatasks/xml'] * (len(tasks) - 6) + ['casasource/almatasks'] * 2 + ['casasource/casaplotms', 'casasource/casaviewer']
+    for name, folder in zip(tasks, folders):
+        write(os.path.join(root, folder, name + '.xml'), task_xml(rng, name, rng.choice(CATEGORIES), rng.randint(sizes['params'] // 2, sizes['params'] * 3 // 2)))
+    for name in ['browsetable', 'msuvbin']:
+        write(os.path.join(root, 'casasource/casa6/casa5/gcwrap/tasks', name + '.xml'), task_xml(rng, name, 'utility', sizes['params']))
+    for name in tasks + ['browsetable', 'msuvbin']:
+        write(os.path.join(root, 'docs/tasks', 'task_%s.rst' % name), description_rst(rng))
+    methods = 0
+    for name in tool_names(sizes):
+        nmethods = rng.randint(sizes['methods'] // 2, sizes['methods'] * 3 // 2)
+        write(os.path.join(root, 'casasource/casa6/casatools/xml', name + '.xml'), tool_xml(rng, name, nmethods))
+        write(os.path.join(root, 'docs/tools', 'tool_%s.rst' % name), description_rst(rng))
+        methods += nmethods
+    return methods
+
+
+##################################################################################
+# changelog, one jira issue per commit with its date and build tags, newest first
+def changelog(rng, root, sizes):
+    prs, dates, builds = [''], [], []
+    build, release = 40, [6, 5, 2]
+    for ii in range(sizes['prs']):
+        fields = {'customfield_10500': paragraph(rng, rng.randint(1, 3)) if rng.random() < 0.9 else None,
+                  'components': [{'id': str(ii), 'name': rng.choice(COMPONENTS)}]}
+        prs += [json.dumps({'expand': 'renderedFields', 'id': str(40000 - ii), 'key': 'CAS-%i' % (14000 - ii), 'fields': fields})]
+        dates += ['Mon May %2i 14:%02i:12 2022 -0400' % (rng.randint(1, 28), rng.randint(0, 59))]
+        tag = ''
+        if rng.random() < 0.1:
+            build -= 1
+            if build < 0:
+                build, release = 40, [release[0], release[1] - 1 if release[1] > 0 else 9, 0]
+            tag = ' (tag: %i.%i.%i.%i)' % tuple(release + [build])
+        builds += ['%040x%s' % (rng.getrandbits(160), tag)]
+    write(os.path.join(root, 'docs/changelog/pullrequests.txt'), '\n'.join(prs) + '\n')
+    write(os.path.join(root, 'docs/changelog/dates.txt'), '\n'.join(dates) + '\n')
+    write(os.path.join(root, 'docs/changelog/builds.txt'), '\n'.join(builds) + '\n')
+
+
+# the whole corpus under root, returns the number of items each kind of input has
+def generate(root, scale=1.0, seed=0):
+    rng = random.Random(seed)
+    sizes = counts(scale)
+    urls = sitemap(sizes, task_names(sizes), tool_names(sizes))
+    write(os.path.join(root, 'scraper/_sitemap.txt'), '\n'.join(urls))
+    os.makedirs(os.path.join(root, 'docs'), exist_ok=True)
+    html_store(rng, os.path.join(root, 'html'), urls)
+    markdown_tree(rng, os.path.join(root, 'markdown'), urls)
+    methods = xml_tree(rng, root, sizes)
+    changelog(rng, root, sizes)
+    return {'pages': len(urls), 'notebook pages': sizes['sections'] * (sizes['subpages'] + 1), 'tasks': sizes['tasks'] + 2,
+            'methods': methods, 'prs': sizes['prs']}
@@ -0,0 +1,88 @@
+import os
+import re
+import subprocess
+import sys
+
+########################################################
+# this is meant to be run from the docs folder
+# if running manually, cd docs first
+#
+#   python ../scripts/changed_pages.py <git ref>
+#
+# works out which tasks, tools and notebooks changed since <ref> and writes the
+# tasks/tools/notebooks_selection.csv files that conf.py limits the build to,
+# adding the pages that link to a changed page (buildme.sh --changed-since)
+#
+# this runs before the task xml is downloaded and parsed, so the category of a task
+# isn't known yet. tasks are selected as *.<name>, which conf.py matches whatever
+# the category turns out to be
+########################################################
+
+ref = sys.argv[1]
+
+# changing one of these changes every page of the group
+GENERATORS = {'scripts/parse_task_xml.py': ['tasks'], 'scripts/parse_tool_xml.py': ['tools'],
+              'scripts/api_rst.py': ['tasks', 'tools'], 'docs/_ext/apirst.py': ['tasks', 'tools'],
+              'docs/_templates/tooldoc.rst': ['tools'],
+              'scripts/convert_html.py': ['notebooks'], 'scripts/build_notebooks.py': ['notebooks']}
+
+# what each kind of page links to, as it appears in the notebooks and the task / tool descriptions
+LINKS = [('notebooks', re.compile(r'([\w-]+)\.ipynb')),
+         ('tasks', re.compile(r'casatasks\.\w+\.(\w+)')),
+         ('tools', re.compile(r'casatools\.(\w+)'))]
+
+
+def git(args, cwd='..'):
+    return subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True, check=True).stdout.splitlines()
+
+
+# files changed since ref (committed or not, and new ones) plus the xml edited in the casa source
+# clone, which --copyxml leaves as uncommitted changes there
+changed = git(['diff', '--name-only', ref, '--']) + git(['ls-files', '--others', '--exclude-standard'])
+if os.path.exists('../casasource/casa6/.git'):
+    changed += ['casasource/casa6/' + ll[3:] for ll in git(['status', '--porcelain', '--', 'casatasks/xml', 'casatools/xml'], cwd='../casasource/casa6')]
+
+pages = {'tasks': set(), 'tools': set(), 'notebooks': set()}
+everything = set()
+for fname in changed:
+    name = os.path.splitext(os.path.basename(fname))[0]
+    if re.match(r'docs/notebooks/[\w-]+\.ipynb$', fname):
+        pages['notebooks'].add(name)
+    elif re.match(r'(docs/tasks/task_\w+\.rst|casasource/casa6/casatasks/xml/\w+\.xml)$', fname):
+        pages['tasks'].add(name[len('task_'):] if name.startswith('task_') else name)
+    elif re.match(r'(docs/tools/tool_\w+\.rst|casasource/casa6/casatools/xml/\w+\.xml)$', fname):
+        pages['tools'].add(name[len('tool_'):] if name.startswith('tool_') else name)
+    elif fname in GENERATORS:
+        everything.update(GENERATORS[fname])
+
+
+# reverse link index, (group, name) -> the pages linking to it
+sources = [('notebooks', fname[:-6], 'notebooks/' + fname) for fname in os.listdir('notebooks') if fname.endswith('.ipynb')]
+sources += [('tasks', fname[5:-4], 'tasks/' + fname) for fname in os.listdir('tasks') if fname.startswith('task_') and fname.endswith('.rst')]
+sources += [('tools', fname[5:-4], 'tools/' + fname) for fname in os.listdir('tools') if fname.startswith('tool_') and fname.endswith('.rst')]
+
+linkers = {}
+for group, name, fname in sources:
+    with open(fname, 'r') as fid:
+        text = fid.read()
+    for target, pattern in LINKS:
+        for link in set(pattern.findall(text)):
+            if (target, link) != (group, name):
+                linkers.setdefault((target, link), set()).add((group, name))
+
+for group, name in [(group, name) for group in pages for name in pages[group]]:
+    for source, link in linkers.get((group, name), []):
+        pages[source].add(link)
+
+
+# the category of each task is filled in by conf.py
+pages['tasks'] = set(['*.' + name for name in pages['tasks']])
+
+# a group with nothing changed is left out entirely, one whose generator changed is built in full
+for group in pages:
+    if os.path.exists('%s_selection.csv' % group):
+        os.remove('%s_selection.csv' % group)
+    if group not in everything:
+        with open('%s_selection.csv' % group, 'w') as fid:
+            fid.write(','.join(sorted(pages[group])) if len(pages[group]) > 0 else 'none')
+    print('%s: %s' % (group, 'all' if group in everything else (', '.join(sorted(pages[group])) or 'none')))
@@ -0,0 +1,171 @@
+##################################################################################
+# checks the internal links of the docs without building them or going online
+#
+# this is meant to be run from the docs folder (buildme.sh --checklinks)
+#
+#   python ../scripts/check_links.py
+#
+# first every page is read once for the anchors it has:
+#   notebooks - markdown headings (as nbsphinx names their sections) and <a id=...> tags
+#   rst       - section titles and .. _label: targets
+# then every relative link in the notebooks and rst pages (including the task and tool
+# descriptions, from where they end up in api/tt) is looked up in that index
+#
+# broken links are listed with the file, line (and notebook cell) they are in, the
+# exit status is 1 if there are any
+##################################################################################
+
+import glob
+import json
+import os
+import re
+import sys
+import time
+from docutils.nodes import make_id
+
+# task and tool descriptions are put on the api/tt pages, their relative links start from there
+BASES = {'tasks': 'api/tt', 'tools': 'api/tt'}
+
+# folders only there after a build (or a submodule update), links in to them are left alone until they are
+LATER = ['api/tt', 'examples']
+
+# markdown links and images, rst embedded uris and named uri targets, :ref: and :doc: roles
+# (a markdown url may have one level of balanced parentheses in it, #Design-(Multi-Processing))
+MD_LINK = re.compile(r'!?\[[^\]]*\]\(((?:[^()\s]|\([^()\s]*\))+)(?:\s+"[^"]*")?\)')
+RST_LINK = re.compile(r'`[^`]*?<([^<>`\s]+)>`__?')
+RST_TARGET = re.compile(r'^\s*\.\. _[^:]+:\s+(\S+)\s*$')
+RST_ROLE = re.compile(r':(ref|doc):`(?:[^`<]*<)?([^`<>]+)>?`')
+
+MD_HEADING = re.compile(r'^#{1,6}\s+(.*?)\s*#*\s*$')
+HTML_ID = re.compile(r'<a\s[^>]*?(?:id|name)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+RST_LABEL = re.compile(r'^\.\. _([^:`]+|`[^`]+`):\s*$')
+RST_UNDERLINE = re.compile(r'^([=\-`:\'"~^_*+#<>.])\1+\s*$')
+
+
+# the text of a markdown heading, as it ends up in the section title
+def heading_text(text):
+    text = re.sub(r'!?\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'(\*\*|__|\*|`)', '', text)
+    return re.sub(r'\\(.)', r'\1', text).strip()
+
+
+# the (line, text) of each notebook markdown cell line, lines counted from 1 within their cell,
+# code blocks left out
+def notebook_lines(fname):
+    with open(fname, 'r') as fid:
+        cells = json.load(fid)['cells']
+    for cc, cell in enumerate(cells):
+        if cell['cell_type'] != 'markdown': continue
+        source = cell['source'] if isinstance(cell['source'], str) else ''.join(cell['source'])
+        fenced = False
+        for ii, line in enumerate(source.split('\n')):
+            if line.lstrip().startswith('```'):
+                fenced = not fenced
+            elif not fenced:
+                yield 'cell %i, line %i' % (cc + 1, ii + 1), line
+
+
+def rst_lines(fname):
+    with open(fname, 'r') as fid:
+        for ii, line in enumerate(fid.read().split('\n')):
+            yield 'line %i' % (ii + 1), line
+
+
+# anchors a notebook page has, nbsphinx replaces the section ids with the title, spaces to dashes
+def notebook_anchors(fname):
+    anchors = set()
+    for where, line in notebook_lines(fname):
+        heading = MD_HEADING.match(line)
+        if heading is not None:
+            anchors.add(heading_text(heading.group(1)).replace(' ', '-'))
+        for ids in HTML_ID.findall(line):
+            anchors.add(''.join(ids))
+    return anchors
+
+
+# anchors an rst page has, docutils makes section and target ids from their names
+def rst_anchors(fname):
+    anchors, labels = set(), set()
+    lines = [line for where, line in rst_lines(fname)]
+    for ii, line in enumerate(lines):
+        label = RST_LABEL.match(line)
+        if label is not None:
+            labels.add(label.group(1).strip('`').lower())
+            anchors.add(make_id(label.group(1).strip('`')))
+        elif (ii > 0) and RST_UNDERLINE.match(line) and (len(lines[ii - 1].strip()) > 0) and (not lines[ii - 1][0].isspace()):
+            if (len(line.rstrip()) >= len(lines[ii - 1].rstrip())) and (not RST_UNDERLINE.match(lines[ii - 1])):
+                anchors.add(make_id(lines[ii - 1]))
+    return anchors, labels
+
+
+# relative links of a page, as (where, link, role) with role None for plain links
+def links(fname):
+    if fname.endswith('.ipynb'):
+        for where, line in notebook_lines(fname):
+            for link in MD_LINK.findall(line):
+                yield where, link, None
+    else:
+        for where, line in rst_lines(fname):
+            for link in RST_LINK.findall(line) + RST_TARGET.findall(line):
+                yield where, link, None
+            for role, link in RST_ROLE.findall(line):
+                yield where, link.strip(), role
+
+
+##################################################################################
+start = time.time()
+pages = sorted(glob.glob('*.rst') + glob.glob('api/**/*.rst', recursive=True) + glob.glob('notebooks/*.ipynb') +
+               glob.glob('tasks/*.rst') + glob.glob('tools/*.rst'))
+
+# page -> set of anchors, plus every :ref: label
+index, labels = {}, set()
+for fname in pages:
+    if fname.endswith('.ipynb'):
+        index[os.path.normpath(fname)] = notebook_anchors(fname)
+    else:
+        index[os.path.normpath(fname)], page_labels = rst_anchors(fname)
+        labels.update(page_labels)
+documents = set([os.path.splitext(fname)[0] for fname in index])
+
+
+# why a link is broken, or None if it isn't
+def check(fname, link, role):
+    base = BASES.get(os.path.dirname(fname), os.path.dirname(fname))
+    if role == 'ref':
+        return None if link.lower() in labels else 'no label %s' % link
+    if role == 'doc':
+        target = link[1:] if link.startswith('/') else os.path.join(base, link)
+        return None if os.path.normpath(target) in documents else 'no page %s' % link
+    if re.match(r'^[a-zA-Z][\w+.-]*:', link) or link.startswith('//'):
+        return None   # http, mailto, ...
+    path, anchor = link.split('#', 1) if '#' in link else (link, None)
+    target = os.path.normpath(os.path.join(base, path)) if len(path) > 0 else os.path.normpath(fname)
+    if target not in index:
+        if os.path.exists(target) or any([target.startswith(ff + '/') and not os.path.exists(ff) for ff in LATER]):
+            return None   # images and other files, or api pages not written yet
+        return 'no page %s' % path
+    if (anchor is None) or (len(anchor) == 0):
+        return None
+    # same page fragments are left to the browser, links to other pages are looked up by sphinx
+    # (case insensitive for notebooks)
+    if len(path) == 0:
+        return None if anchor in index[target] else 'no anchor #%s' % anchor
+    if target.endswith('.ipynb'):
+        return None if anchor.lower() in [aa.lower() for aa in index[target]] else 'no anchor #%s in %s' % (anchor, path)
+    return None if (anchor in index[target]) or (make_id(anchor) in index[target]) else 'no anchor #%s in %s' % (anchor, path)
+
+
+broken, count = [], 0
+for fname in pages:
+    for where, link, role in links(fname):
+        count += 1
+        reason = check(os.path.normpath(fname), link, role)
+        if reason is not None:
+            broken += ['%s (%s): %s - %s' % (fname, where, link, reason)]
+
+for bb in broken:
+    print(bb)
+print('links: %i pages, %i anchors, %i links checked, %i broken (%.1fs)' %
+      (len(pages), sum([len(aa) for aa in index.values()]), count, len(broken), time.time() - start))
+sys.exit(1 if len(broken) > 0 else 0)
@@ -1,176 +1,273 @@
 ##################################################################################
 # converts downloaded Plone html pages to markdown for Jupyter notebook cells or
 # restructuredText format for directory trees and the task / tool pages
+#
+# pages are read from the scraper's page store, the html folder by default or
+# a single sqlite file (see scraper/pagestore.py), and piped to pandoc
+# images are fetched through the local media cache (see media_cache.py)
+#
+# the functions here are also used by the scraper's StreamingConvert extension to
+# convert pages while the crawl is still running
 ##################################################################################
 
 import os
 import re
+import sys
+import json
+import argparse
+import subprocess
 
-# grab the list of all pages in casadocs
-with open('scraper/_sitemap.txt') as fid:
-    urls = fid.read().splitlines()
-#urls = ['https://casa.nrao.edu/casadocs-devel/stable/imaging/synthesis-imaging/image-definition']
-#urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/visibility-data-import-export/uv-data-import']
-#urls = ['https://casa.nrao.edu/casadocs-devel/stable/global-task-list/task_tclean']
-#urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/data-examination-and-editing/using-plotms-to-plot-and-edit-visibilities-and-calibration-tables']
-#urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/data-selection-in-a-measurementset']
-#url = urls[0]
-
-os.system('rm -fr markdown')
-os.system('rm -fr docs/tasks')
-os.system('rm -fr docs/tools')
-os.system('mkdir markdown')
-os.system('mkdir docs/tasks')
-os.system('mkdir docs/tools')
-
-# each page in casadocs should have already been downloaded by the scrapy spider to an html file
-# the local html directory structure should  match the casadocs website structure
-# we will execute pandoc on each of these files to convert their format
-for ii, url in enumerate(urls):
-    fpath = ['html'] + url.split("/")[4:]
-    if url.endswith('global-task-list') or (re.match('.*/global-task-list/task_\S*/.+', url) is not None): continue
-    if url.endswith('global-tool-list') or (re.match('.*/global-tool-list/tool_\S*/.+', url) is not None): continue
-    if 'stable' not in url: continue   # ignore root directory test files
-    
-    source = '/'.join(fpath) + '.html'
-    if os.path.exists(source):
-        print('converting %s of %s...' % (str(ii), str(len(urls))), end='\r')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper.pagestore import open_store
+from media_cache import MediaCache
 
-        if 'global-task-list' in fpath:
-            dest = 'docs/tasks/' + url.split("/")[-1]
-        elif 'global-tool-list' in fpath:
-            dest = 'docs/tools/' + url.split("/")[-1]
-        else:
-            spath = ['markdown'] + url.split("/")[5:]
-            for ii in range(1,len(spath)):
-                subdir = '/'.join(spath[:ii])
-                if not os.path.isdir(subdir):
-                    os.mkdir(subdir)
-            dest = '/'.join(spath)
-            dest = 'markdown/index' if dest == 'markdown' else dest
-        
-        # use pandoc to convert html to either ipynb or rst format
-        # rst is used for task / tool descriptions that are later turned in to docstrings
-        # the top level markdown/index file is from html/stable and forms the index.rst later on
-        if ('global-task-list' in fpath) or ('global-tool-list' in fpath) or (dest == 'markdown/index'):
-            # merge some of the individual task pages
-            fullrst = ''
-            for head, suffix in [('Description',''), ('Examples', '/examples'), ('Development','/developer')]:
-                tsrc = source.replace('.html', suffix+'.html')
-                if not os.path.exists(tsrc): continue
-                os.system('pandoc %s -f html -t rst -o %s --extract-media=%s' % (tsrc, dest+'.rst', dest[:dest.rindex('/')]+'/_apimedia'))
-                with open(dest+'.rst', 'r') as fid:
-                    rst = fid.read()
-
-                # convert to sphinx boxes
-                rst = re.sub('(\s*)\.\. container:: casa-\S*-box', r'\1::', rst, flags=re.DOTALL)  # change code boxes
-                rst = re.sub('(\s*)\.\. container:: terminal-box', r'\1::', rst, flags=re.DOTALL)  # change terminal boxes
-                rst = re.sub('(\s*)\.\. container:: alert-box\s*', r'\1.. warning:: ', rst, flags=re.DOTALL)  # change alert boxes
-                rst = re.sub('(\s*)\.\. container:: \S*-box\s*', r'\1.. note:: ', rst, flags=re.DOTALL)  # change info boxes
-
-                # remove containers and de-indent text below
-                for ii in range(10):
-                    for blob in re.finditer('(?<=\n).. container::.*?\n\n   (.*?\n\n)(?=\S)', rst, flags=re.DOTALL):
-                        rst = rst.replace(blob.group(0), blob.group(1).replace('\n   ','\n'))
-                
-                # remove remaining container sections
-                rst = re.sub('\s*\.\. container::(\s*\S*)*?\n(\s*:name: \S*\n)?', '\n', rst, flags=re.DOTALL)
-            
-                # rubrics don't need names and classes
-                rst = re.sub('(\s*\.\. rubric::.*?)(:name: \S*)?\s*(:class: \S*)?\n\s*?\n', r'\1\n\n', rst, flags=re.DOTALL)
-                rst = re.sub('(\s*)\.\. rubric::\s*\n\n', r'\1\n\n', rst, flags=re.DOTALL)  # remove empty rubrics
-                
-                rst = rst.replace(' ', ' ').replace('\\ ', ' ').replace('↩ ', '')  # weird ascii things
-                rst = re.sub('(:math:\s*`[^\n]+) `', r'\1`', rst, flags=re.DOTALL)  # fix math equations with trailing space before `
-                rst = re.sub('\s*[\+\-]+\n\s*\| Citation.*?\n\n', '\n\n', rst, flags=re.DOTALL)  # remove citation tables
-                rst = re.sub('\n\s+Bibliography\s*\n', '\n\n\n   Bibliography\n', rst, flags=re.DOTALL)  # fix bibliography indent
-                
-                # fix image links and get rid of image attributes, they don't work with Sphinx
-                rst = re.sub('(\.\. \|.*?\| image:: )docs/tasks/_apimedia/(\S*)\s*?\n', r'\1_apimedia/\2\n', rst, flags=re.DOTALL)
-                rst = re.sub('(\.\. \|.*?\| image:: )docs/tools/_apimedia/(\S*)\s*?\n', r'\1_apimedia/\2\n', rst, flags=re.DOTALL)
-                rst = re.sub('\n\s*:class:.*?\n', r'\n', rst, flags=re.DOTALL)
-                rst = re.sub('\n\s*:width:.*?\n', r'\n', rst, flags=re.DOTALL)
-                rst = re.sub('\n\s*:height:.*?\n', r'\n', rst, flags=re.DOTALL)
-
-                # create heading
-                header = '\n\n.. _%s:\n\n%s\n   ' % (head, head)
-                if re.search('(\n\S+\n=+\n+)(.*)', rst, flags=re.DOTALL):
-                    rst = header + re.search('(\n\S+\n=+\n+)(.*)', rst, flags=re.DOTALL).group(2).replace('\n','\n   ')
-                else:
-                    rst = header + rst.strip().replace('\n','\n   ')
-                
-                # tack on the end
-                fullrst = fullrst + rst
-
-            with open(dest + '.rst', 'w') as fid:
-                fid.write(fullrst)
-            
-        # otherwise use ipynb format for easier content editing later on
+
+# task and tool subpages (examples, developer) are merged in to their parent page, so they are converted as one unit
+def unit(url):
+    return re.sub('(.*/global-t(ask|ool)-list/t(ask|ool)_[^/]*)/.+', r'\1', url)
+
+
+# start over with empty output folders
+def clean_outputs():
+    os.system('rm -fr markdown')
+    os.system('rm -fr docs/tasks')
+    os.system('rm -fr docs/tools')
+    os.system('mkdir markdown')
+    os.system('mkdir docs/tasks')
+    os.system('mkdir docs/tools')
+
+
+# delete the outputs of pages that are gone from the sitemap
+# returns the parent pages that lost a subpage and need to be converted again
+def remove_outputs(removed):
+    parents = set()
+    for uu in removed:
+        if unit(uu) != uu:
+            parents.add(unit(uu))
+        elif 'global-task-list' in uu:
+            os.system('rm -f docs/tasks/%s.rst' % uu.split('/')[-1])
+        elif 'global-tool-list' in uu:
+            os.system('rm -f docs/tools/%s.rst' % uu.split('/')[-1])
         else:
-            os.system('pandoc %s -f html -t markdown-grid_tables -o %s --wrap=none --atx-headers --extract-media=%s' % (source, dest+'.md', 'markdown/_media')) #'/'.join(spath[:-1])))
-            
-            with open(dest+r'.md', 'r') as fid:
-                md = fid.read()
-            
-            # clean up citations
-            md = re.sub('\(#cit.*?\){.*?}', '(#Bibliography)', md)
-            md = re.sub(' +\-{17} \-+.*?\-{17} \-+', '', md, flags=re.DOTALL)
-            md = re.sub('<table class=\"citation\-table\">.*?</table>', '', md, flags=re.DOTALL)
-            md = re.sub('::: {#citation-title}\s*Bibliography\s*:::\s*', ':::\n# Bibliography\n:::\n', md, flags=re.DOTALL)
-            for bib in re.finditer(':::\n# Bibliography\n:::\n(.*?):::\s*:::', md, flags=re.DOTALL):
-                txt = re.sub('\s*</?div>\s*', '', bib.group(1), flags=re.DOTALL).replace('\n', ' ')
-                txt = re.sub(r'\W*\^(\d\.)[\\\^\s]+(.+?)\[.*?\]\(#ref.*?\)', r'\1 \2\n', txt)
-                md = md.replace(bib.group(1), txt)
-            
-            # clean simple tables
-            for tgp in re.finditer('::: {.table\-wrap}(.*?):::', md, flags=re.DOTALL):
-                md = md.replace(tgp.group(1), re.sub(r'\[([^\]]*?)\]\{style.*?\}',
-                                                     lambda m: m.group(1)+' '*(len(m.group(0))-len(m.group(1))),
-                                                     tgp.group(1), flags=re.DOTALL))
-            
-            # remove escapes, <div> tags, and heading symbols from code blocks
-            for bs in ['casa-input-box', 'terminal-box', 'casa-output-box', 'info-box', 'alert-box']:
-                for tgp in re.finditer('::: {\.%s}(.*?):::'%bs, md, flags=re.DOTALL):
-                    submd = re.sub(r'\\(?!n)', '', tgp.group(1))
-                    submd = re.sub('#[^\S\n]+', '#', submd, flags=re.DOTALL)
-                    submd = re.sub('</?div>', '', submd, flags=re.DOTALL)
-                    md = md.replace(tgp.group(1), submd)
-            
-            # convert the various text boxes
-            md = re.sub('::: {.info-box}(.*?):::\n', r'<div class="alert alert-info">\1</div>\n', md, flags=re.DOTALL)
-            md = re.sub('::: {.alert-box}(.*?):::\n', r'<div class="alert alert-warning">\1</div>\n', md, flags=re.DOTALL)
-            md = re.sub('::: {.casa-input-box}(.*?):::\n', r'```\1```\n', md, flags=re.DOTALL)
-            md = re.sub('::: {.terminal-box}(.*?):::\n', r'```\1```\n', md, flags=re.DOTALL)
-            md = re.sub('::: {.casa-output-box}(.*?):::\n', r'```python\1```\n', md, flags=re.DOTALL)
-            md = re.sub(':::.*', '', md)
-            
-            # weird ascii things
-            md = md.replace(' ', ' ').replace('\\\n', '')
-            md = re.sub('\n\n\n+', '\n\n', md, flags=re.DOTALL)
-            md = re.sub('(\S+)\n(\-+)\n', r'\1\n\n\2\n', md, flags=re.DOTALL)   # preserve horizontal rules after removing stray / chars
-            
-            # get rid of remaining weird style tags
-            md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
-            md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL) # do a couple times for nested things
-            md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
-            md = re.sub(r'\{\.s1.*?\}|\{style.*?\}', '', md, flags=re.DOTALL) # kill remaining dangling style tags
-            #md = re.sub(r'\[([^\n]+)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
-            #md = re.sub(r'\[([^\n]+)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL) # do a couple times for nested things
-            md = re.sub('{.*? \.documentFirstHeading}', '', md)
-            md = re.sub('(\n#+ [^\n]*)\{.*?\}', r'\1', md, flags=re.DOTALL)  # bracketing in headers must go
-            md = re.sub('\n#+ +\n', '\n', md, flags=re.DOTALL)  # some headers end up empty after previous cleanup
+            os.system('rm -f %s.md' % '/'.join(['markdown'] + uu.split('/')[5:]))
+    return parents
+
+
+# pandoc reads the page from stdin, so it doesn't matter how the page store keeps it
+# raises CalledProcessError if pandoc fails, the caller decides whether to go on with the other pages
+def pandoc(html, args):
+    subprocess.run(['pandoc', '-f', 'html'] + args, input=html, text=True, check=True)
+
+
+# each page in casadocs should have already been downloaded by the scrapy spider to the page store
+# the url paths of the pages match the casadocs website structure
+# we will execute pandoc on each of these pages to convert their format
+# returns the output file (without extension), or None if the page is not converted on its own
+# with a MediaCache, pandoc gets the page's images from the cache instead of downloading them
+def convert_page(store, url, media=None):
+    fpath = url.split("/")[4:]
+    if url.endswith('global-task-list') or (re.match('.*/global-task-list/task_\S*/.+', url) is not None): return None
+    if url.endswith('global-tool-list') or (re.match('.*/global-tool-list/tool_\S*/.+', url) is not None): return None
+    if 'stable' not in url: return None   # ignore root directory test files
+    
+    source = store.get(url)
+    if source is None:
+        return None
+
+    if 'global-task-list' in fpath:
+        dest = 'docs/tasks/' + url.split("/")[-1]
+    elif 'global-tool-list' in fpath:
+        dest = 'docs/tools/' + url.split("/")[-1]
+    else:
+        spath = ['markdown'] + url.split("/")[5:]
+        if len(spath) > 1:
+            os.makedirs('/'.join(spath[:-1]), exist_ok=True)  # other pages may be converting at the same time
+        dest = '/'.join(spath)
+        dest = 'markdown/index' if dest == 'markdown' else dest
+    
+    # use pandoc to convert html to either ipynb or rst format
+    # rst is used for task / tool descriptions that are later turned in to docstrings
+    # the top level markdown/index file is from html/stable and forms the index.rst later on
+    if ('global-task-list' in fpath) or ('global-tool-list' in fpath) or (dest == 'markdown/index'):
+        # merge some of the individual task pages
+        fullrst = ''
+        for head, suffix in [('Description',''), ('Examples', '/examples'), ('Development','/developer')]:
+            tsrc = store.get(url + suffix)
+            if tsrc is None: continue
+            tsrc = media.localize(tsrc) if media is not None else tsrc
+            pandoc(tsrc, ['-t', 'rst', '-o', dest+'.rst', '--extract-media=%s' % (dest[:dest.rindex('/')]+'/_apimedia')])
+            with open(dest+'.rst', 'r') as fid:
+                rst = fid.read()
+
+            # convert to sphinx boxes
+            rst = re.sub('(\s*)\.\. container:: casa-\S*-box', r'\1::', rst, flags=re.DOTALL)  # change code boxes
+            rst = re.sub('(\s*)\.\. container:: terminal-box', r'\1::', rst, flags=re.DOTALL)  # change terminal boxes
+            rst = re.sub('(\s*)\.\. container:: alert-box\s*', r'\1.. warning:: ', rst, flags=re.DOTALL)  # change alert boxes
+            rst = re.sub('(\s*)\.\. container:: \S*-box\s*', r'\1.. note:: ', rst, flags=re.DOTALL)  # change info boxes
+
+            # remove containers and de-indent text below
+            for ii in range(10):
+                for blob in re.finditer('(?<=\n).. container::.*?\n\n   (.*?\n\n)(?=\S)', rst, flags=re.DOTALL):
+                    rst = rst.replace(blob.group(0), blob.group(1).replace('\n   ','\n'))
             
-            # fix image links to work properly from notebooks
-            md = re.sub('!\[.*?]\(\S*?/(\w*)(\.\w*).*?\)', r'![\1](media/\1\2)', md, flags=re.DOTALL)
+            # remove remaining container sections
+            rst = re.sub('\s*\.\. container::(\s*\S*)*?\n(\s*:name: \S*\n)?', '\n', rst, flags=re.DOTALL)
+        
+            # rubrics don't need names and classes
+            rst = re.sub('(\s*\.\. rubric::.*?)(:name: \S*)?\s*(:class: \S*)?\n\s*?\n', r'\1\n\n', rst, flags=re.DOTALL)
+            rst = re.sub('(\s*)\.\. rubric::\s*\n\n', r'\1\n\n', rst, flags=re.DOTALL)  # remove empty rubrics
             
-            # fix image captions
-            md = re.sub(' +\-{9} \-+.*?Caption\s*(.*?)\-{9} \-+', r'>\1', md, flags=re.DOTALL)
+            rst = rst.replace(' ', ' ').replace('\\ ', ' ').replace('↩ ', '')  # weird ascii things
+            rst = re.sub('(:math:\s*`[^\n]+) `', r'\1`', rst, flags=re.DOTALL)  # fix math equations with trailing space before `
+            rst = re.sub('\s*[\+\-]+\n\s*\| Citation.*?\n\n', '\n\n', rst, flags=re.DOTALL)  # remove citation tables
+            rst = re.sub('\n\s+Bibliography\s*\n', '\n\n\n   Bibliography\n', rst, flags=re.DOTALL)  # fix bibliography indent
             
-            # change internal hyperlinks to new address
-            md = re.sub('(\[.*?\])\(https://casa.nrao.edu/casadocs-devel/stable/(\S*?)/.*?([^/]*?)\)', r'\1(\2.ipynb#\3)', md, flags=re.DOTALL)
+            # fix image links and get rid of image attributes, they don't work with Sphinx
+            rst = re.sub('(\.\. \|.*?\| image:: )docs/tasks/_apimedia/(\S*)\s*?\n', r'\1_apimedia/\2\n', rst, flags=re.DOTALL)
+            rst = re.sub('(\.\. \|.*?\| image:: )docs/tools/_apimedia/(\S*)\s*?\n', r'\1_apimedia/\2\n', rst, flags=re.DOTALL)
+            rst = re.sub('\n\s*:class:.*?\n', r'\n', rst, flags=re.DOTALL)
+            rst = re.sub('\n\s*:width:.*?\n', r'\n', rst, flags=re.DOTALL)
+            rst = re.sub('\n\s*:height:.*?\n', r'\n', rst, flags=re.DOTALL)
+
+            # create heading
+            header = '\n\n.. _%s:\n\n%s\n   ' % (head, head)
+            if re.search('(\n\S+\n=+\n+)(.*)', rst, flags=re.DOTALL):
+                rst = header + re.search('(\n\S+\n=+\n+)(.*)', rst, flags=re.DOTALL).group(2).replace('\n','\n   ')
+            else:
+                rst = header + rst.strip().replace('\n','\n   ')
             
-            with open(dest+r'.md', 'w') as fid:
-                fid.write(md)
+            # tack on the end
+            fullrst = fullrst + rst
+
+        with open(dest + '.rst', 'w') as fid:
+            fid.write(fullrst)
+        
+    # otherwise use ipynb format for easier content editing later on
+    else:
+        source = media.localize(source) if media is not None else source
+        pandoc(source, ['-t', 'markdown-grid_tables', '-o', dest+'.md', '--wrap=none', '--atx-headers', '--extract-media=%s' % 'markdown/_media']) #'/'.join(spath[:-1])))
+        
+        with open(dest+r'.md', 'r') as fid:
+            md = fid.read()
+        
+        # clean up citations
+        md = re.sub('\(#cit.*?\){.*?}', '(#Bibliography)', md)
+        md = re.sub(' +\-{17} \-+.*?\-{17} \-+', '', md, flags=re.DOTALL)
+        md = re.sub('<table class=\"citation\-table\">.*?</table>', '', md, flags=re.DOTALL)
+        md = re.sub('::: {#citation-title}\s*Bibliography\s*:::\s*', ':::\n# Bibliography\n:::\n', md, flags=re.DOTALL)
+        for bib in re.finditer(':::\n# Bibliography\n:::\n(.*?):::\s*:::', md, flags=re.DOTALL):
+            txt = re.sub('\s*</?div>\s*', '', bib.group(1), flags=re.DOTALL).replace('\n', ' ')
+            txt = re.sub(r'\W*\^(\d\.)[\\\^\s]+(.+?)\[.*?\]\(#ref.*?\)', r'\1 \2\n', txt)
+            md = md.replace(bib.group(1), txt)
+        
+        # clean simple tables
+        for tgp in re.finditer('::: {.table\-wrap}(.*?):::', md, flags=re.DOTALL):
+            md = md.replace(tgp.group(1), re.sub(r'\[([^\]]*?)\]\{style.*?\}',
+                                                 lambda m: m.group(1)+' '*(len(m.group(0))-len(m.group(1))),
+                                                 tgp.group(1), flags=re.DOTALL))
+        
+        # remove escapes, <div> tags, and heading symbols from code blocks
+        for bs in ['casa-input-box', 'terminal-box', 'casa-output-box', 'info-box', 'alert-box']:
+            for tgp in re.finditer('::: {\.%s}(.*?):::'%bs, md, flags=re.DOTALL):
+                submd = re.sub(r'\\(?!n)', '', tgp.group(1))
+                submd = re.sub('#[^\S\n]+', '#', submd, flags=re.DOTALL)
+                submd = re.sub('</?div>', '', submd, flags=re.DOTALL)
+                md = md.replace(tgp.group(1), submd)
+        
+        # convert the various text boxes
+        md = re.sub('::: {.info-box}(.*?):::\n', r'<div class="alert alert-info">\1</div>\n', md, flags=re.DOTALL)
+        md = re.sub('::: {.alert-box}(.*?):::\n', r'<div class="alert alert-warning">\1</div>\n', md, flags=re.DOTALL)
+        md = re.sub('::: {.casa-input-box}(.*?):::\n', r'```\1```\n', md, flags=re.DOTALL)
+        md = re.sub('::: {.terminal-box}(.*?):::\n', r'```\1```\n', md, flags=re.DOTALL)
+        md = re.sub('::: {.casa-output-box}(.*?):::\n', r'```python\1```\n', md, flags=re.DOTALL)
+        md = re.sub(':::.*', '', md)
+        
+        # weird ascii things
+        md = md.replace(' ', ' ').replace('\\\n', '')
+        md = re.sub('\n\n\n+', '\n\n', md, flags=re.DOTALL)
+        md = re.sub('(\S+)\n(\-+)\n', r'\1\n\n\2\n', md, flags=re.DOTALL)   # preserve horizontal rules after removing stray / chars
+        
+        # get rid of remaining weird style tags
+        md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
+        md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL) # do a couple times for nested things
+        md = re.sub(r'\[([^\]]*?)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
+        md = re.sub(r'\{\.s1.*?\}|\{style.*?\}', '', md, flags=re.DOTALL) # kill remaining dangling style tags
+        #md = re.sub(r'\[([^\n]+)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL)
+        #md = re.sub(r'\[([^\n]+)\]\{(\.s1)?\s?(style)?.*?\}', r'\1', md, flags=re.DOTALL) # do a couple times for nested things
+        md = re.sub('{.*? \.documentFirstHeading}', '', md)
+        md = re.sub('(\n#+ [^\n]*)\{.*?\}', r'\1', md, flags=re.DOTALL)  # bracketing in headers must go
+        md = re.sub('\n#+ +\n', '\n', md, flags=re.DOTALL)  # some headers end up empty after previous cleanup
+        
+        # fix image links to work properly from notebooks
+        md = re.sub('!\[.*?]\(\S*?/(\w*)(\.\w*).*?\)', r'![\1](media/\1\2)', md, flags=re.DOTALL)
+        
+        # fix image captions
+        md = re.sub(' +\-{9} \-+.*?Caption\s*(.*?)\-{9} \-+', r'>\1', md, flags=re.DOTALL)
+        
+        # change internal hyperlinks to new address
+        md = re.sub('(\[.*?\])\(https://casa.nrao.edu/casadocs-devel/stable/(\S*?)/.*?([^/]*?)\)', r'\1(\2.ipynb#\3)', md, flags=re.DOTALL)
+        
+        with open(dest+r'.md', 'w') as fid:
+            fid.write(md)
+    return dest
+
+
+if __name__ == '__main__':
+    # grab the list of all pages in casadocs
+    with open('scraper/_sitemap.txt') as fid:
+        urls = fid.read().splitlines()
+    #urls = ['https://casa.nrao.edu/casadocs-devel/stable/imaging/synthesis-imaging/image-definition']
+    #urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/visibility-data-import-export/uv-data-import']
+    #urls = ['https://casa.nrao.edu/casadocs-devel/stable/global-task-list/task_tclean']
+    #urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/data-examination-and-editing/using-plotms-to-plot-and-edit-visibilities-and-calibration-tables']
+    #urls = ['https://casa.nrao.edu/casadocs-devel/stable/calibration-and-visibility-data/data-selection-in-a-measurementset']
+    #url = urls[0]
+
+    parser = argparse.ArgumentParser(description='convert scraped casadocs pages with pandoc')
+    parser.add_argument('changes', nargs='?', default=None, help='change list json file of an incremental crawl')
+    parser.add_argument('--store', default='html', help='page store the scraper saved to (PAGE_STORE)')
+    parser.add_argument('--changed', action='store_true', help='use the change list saved in the page store')
+    parser.add_argument('--media-cache', default='.media_cache', help='image cache folder, an empty string to let pandoc download them')
+    args = parser.parse_args()
+    store = open_store(args.store)
+
+    # an incremental crawl saves a list of the pages it changed, passing that list in here
+    # converts just those pages on top of the previous output instead of starting from scratch
+    #   python scripts/convert_html.py html/_changes.json
+    #   python scripts/convert_html.py --store html.sqlite --changed
+    changes = None
+    if args.changes is not None:
+        with open(args.changes) as fid:
+            changes = json.load(fid)
+    elif args.changed:
+        changes = store.read_meta('changes')
+
+    if changes is None:
+        clean_outputs()
+    else:
+        changed = set([unit(uu) for uu in changes['added'] + changes['modified']]) | remove_outputs(changes['removed'])
+        urls = [uu for uu in urls if uu in changed]
+
+    # every image is downloaded once up front, pages then only read them from the cache
+    media = None
+    if len(args.media_cache) > 0:
+        media = MediaCache(args.media_cache)
+        media.prefetch([store.get(uu) for uu in urls])
+
+    # a page pandoc fails on is reported and skipped, the rest are still converted
+    failed = []
+    for ii, url in enumerate(urls):
+        print('converting %s of %s...' % (str(ii), str(len(urls))), end='\r')
+        try:
+            convert_page(store, url, media)
+        except subprocess.CalledProcessError as err:
+            print('\npandoc failed on %s (exit status %i)' % (url, err.returncode))
+            failed += [url]
 
-print('')
-print('done')
+    print('')
+    if len(failed) > 0:
+        print('%i pages not converted' % len(failed))
+    if media is not None:
+        media.save()
+        print('media cache: %(hits)i hits, %(fetched)i downloaded, %(failed)i failed' % media.counts)
+    print('done')
@@ -0,0 +1,118 @@
+##################################################################################
+# local cache of the images embedded in the scraped pages
+#
+# pandoc --extract-media downloads every remote image again for each page that
+# uses it, and again on every build. here each image url is downloaded once in
+# to the cache folder, named by the sha256 of its content, and the pages are
+# handed to pandoc with their <img> tags pointing at the cached files instead
+#
+# the index (url -> file and hash) is kept in the cache folder between builds and
+# every file is checked against its hash the first time it is used in a build,
+# so a warm rebuild doesn't touch the network at all
+##################################################################################
+
+import hashlib
+import html
+import json
+import mimetypes
+import os
+import re
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+IMG_SRC = re.compile(r'(<img\b[^>]*?\bsrc=")(https?://[^"]+)(")', flags=re.IGNORECASE)
+
+
+class MediaCache:
+
+    def __init__(self, root='.media_cache', workers=8):
+        self.root = root
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.fetching = {}
+        self.checked = set()
+        self.counts = {'hits': 0, 'fetched': 0, 'failed': 0}
+        self.index = {}
+        if os.path.exists(os.path.join(root, 'index.json')):
+            with open(os.path.join(root, 'index.json')) as fid:
+                self.index = json.load(fid)
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    # true if the cached copy of the url is there and still has the content it was saved with
+    def valid(self, url):
+        entry = self.index.get(url)
+        if entry is None:
+            return False
+        if url in self.checked:
+            return True
+        fname = os.path.join(self.root, entry['file'])
+        if not os.path.exists(fname):
+            return False
+        with open(fname, 'rb') as fid:
+            if hashlib.sha256(fid.read()).hexdigest() != entry['sha256']:
+                return False
+        self.checked.add(url)
+        return True
+
+    def download(self, url):
+        with urllib.request.urlopen(url, timeout=60) as response:
+            data = response.read()
+            ctype = response.headers.get_content_type()
+        sha = hashlib.sha256(data).hexdigest()
+        ext = os.path.splitext(url.split('?')[0].split('/')[-1])[1] or mimetypes.guess_extension(ctype) or ''
+        entry = {'file': '%s/%s%s' % (sha[:2], sha, ext.lower()), 'sha256': sha}
+        fname = os.path.join(self.root, entry['file'])
+        if not os.path.exists(fname):
+            os.makedirs(os.path.dirname(fname), exist_ok=True)
+            with open(fname + '.part', 'wb') as fid:
+                fid.write(data)
+            os.replace(fname + '.part', fname)
+        return entry
+
+    # local path of the cached copy of url, downloading it the first time
+    # returns None if it can't be downloaded
+    def path(self, url):
+        with self.lock:
+            busy = self.fetching.setdefault(url, threading.Lock())
+        with busy:
+            if self.valid(url):
+                self.count('hits')
+            else:
+                try:
+                    entry = self.download(url)
+                except Exception as err:
+                    print('WARNING: could not fetch %s: %s' % (url, err))
+                    self.count('failed')
+                    return None
+                with self.lock:
+                    self.index[url] = entry
+                    self.checked.add(url)
+                self.count('fetched')
+        return os.path.abspath(os.path.join(self.root, self.index[url]['file']))
+
+    # download all the images of a set of pages up front, several at a time
+    def prefetch(self, pages):
+        urls = set()
+        for page in pages:
+            if page is not None:
+                urls.update([html.unescape(mm.group(2)) for mm in IMG_SRC.finditer(page)])
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(self.path, sorted(urls)))
+
+    # the page with its remote images pointing at their cached copies
+    def localize(self, page):
+        def local(mm):
+            fname = self.path(html.unescape(mm.group(2)))
+            return mm.group(0) if fname is None else mm.group(1) + html.escape(fname) + mm.group(3)
+        return IMG_SRC.sub(local, page)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        with self.lock:
+            with open(os.path.join(self.root, 'index.json.part'), 'w') as fid:
+                json.dump(self.index, fid, indent=1, sort_keys=True)
+            os.replace(os.path.join(self.root, 'index.json.part'), os.path.join(self.root, 'index.json'))
@@ -1,21 +1,30 @@
 import re
+import os
+import sys
+import json
+import hashlib
 from datetime import datetime
 
-with open('changelog/pullrequests.txt', 'r') as fid:
-    raw_prs = fid.read().split('\n')[1:]
+# the three changelog files are read line by line together:
+#   pullrequests.txt - one jira issue (json) per commit, after a leading blank line
+#   dates.txt        - the commit date
+#   builds.txt       - the commit hash and its refs, including any build tags
+BUILD_TAG = re.compile(r'tag: (\d\.\d\.\d\.\d+)')
 
-with open('changelog/dates.txt', 'r') as fid:
-    raw_dates = fid.read().split('\n')
+# rendered entries from previous builds, keyed by a digest of the lines they came from
+# so only new or changed lines are parsed and rendered again (the same jira issue can be in
+# several commits, with different dates and builds, so it can't be the key)
+CACHE_FILE = 'changelog/_rendered.json'
 
-with open('changelog/builds.txt', 'r') as fid:
-    raw_builds = fid.read().split('\n')
+# with --per-release, changelog.rst is just an index and the entries of each release (X.Y.Z)
+# go on their own page in changelog/, newest first
+PER_RELEASE = '--per-release' in sys.argv
 
-difflog = ''
-for ii, raw_line in enumerate(raw_prs):
-    if len(raw_line.strip()) == 0: continue
-    prdict = eval(raw_line.replace('true', 'True').replace('false', 'False').replace('null','None'))
-    date = datetime.strptime(raw_dates[ii][4:-6], '%b %d %H:%M:%S %Y').strftime('%m/%d/%y')
-    build = re.findall('.*?tag: (\d\.\d\.\d\.\d+).*?', raw_builds[ii], flags=re.DOTALL)
+
+def render(pr_line, date_line, build_line):
+    prdict = json.loads(pr_line)
+    date = datetime.strptime(date_line[4:-6], '%b %d %H:%M:%S %Y').strftime('%m/%d/%y')
+    build = BUILD_TAG.findall(build_line)
     build = ' <sup>['+', '.join(build)+']</sup> ' if len(build) > 0 else ' '
     id = prdict['key']
     components = [cc['name'] for cc in prdict['fields']['components']]
@@ -23,10 +32,71 @@ for ii, raw_line in enumerate(raw_prs):
     if note is not None: note = note.replace('\n', '\n   ')
     if (len(components) == 1) and (components[0] == 'Verification'):
         note = note if (note is not None) and (len(note.strip()) > 0) else 'Verification test development'
-    difflog += '   <li><p><i>%s</i> <b>%s</b>%s- %s</p></li>\n\n' % (date, id, build, note)
+    return '   <li><p><i>%s</i> <b>%s</b>%s- %s</p></li>\n\n' % (date, id, build, note)
+
+
+# commits are listed newest first, a commit goes in to the first build tagged at or after it
+# (the lowest tag when a commit has several), commits after the last tag are unreleased
+def release_of(build_line, current):
+    tags = BUILD_TAG.findall(build_line)
+    if len(tags) == 0:
+        return current
+    return '.'.join(min(tags, key=lambda tt: [int(vv) for vv in tt.split('.')]).split('.')[:3])
+
+
+def page(title, body):
+    return title + '\n' + '=' * len(title) + '\n\n' + body
+
+
+def write_if_changed(fname, text):
+    previous = None
+    if os.path.exists(fname):
+        with open(fname, 'r', newline='') as fid:
+            previous = fid.read()
+    if text != previous:
+        with open(fname, 'w') as fid:
+            fid.write(text)
+    return text != previous
+
+
+cache = {}
+if os.path.exists(CACHE_FILE):
+    with open(CACHE_FILE, 'r') as fid:
+        cache = json.load(fid)
+
+entries, rendered = {}, 0
+difflog, releases, current = '', {}, 'unreleased'
+with open('changelog/pullrequests.txt', 'r') as prs, open('changelog/dates.txt', 'r') as dates, open('changelog/builds.txt', 'r') as builds:
+    prs.readline()
+    for pr_line, date_line, build_line in zip(prs, dates, builds):
+        pr_line, date_line, build_line = pr_line.rstrip('\n'), date_line.rstrip('\n'), build_line.rstrip('\n')
+        current = release_of(build_line, current)
+        if len(pr_line.strip()) == 0: continue
+        digest = hashlib.sha1('\n'.join([pr_line, date_line, build_line]).encode('utf-8')).hexdigest()
+        if digest not in cache:
+            cache[digest] = render(pr_line, date_line, build_line)
+            rendered += 1
+        entries[digest] = cache[digest]
+        difflog += cache[digest]
+        releases[current] = releases.get(current, '') + cache[digest]
+
+# write out log of tool API diffs, leaving the files alone (and sphinx's copy of them up to date) if nothing changed
+names = dict([(rr, 'unreleased' if rr == 'unreleased' else 'casa-' + rr) for rr in releases]) if PER_RELEASE else {}
+for fname in os.listdir('changelog'):
+    if fname.endswith('.rst') and (fname[:-4] not in names.values()):
+        os.remove('changelog/' + fname)
 
-# write out log of tool API diffs
-with open('changelog.rst', 'w') as fid:
-    fid.write('Change Log\n==========\n\n')
-    fid.write('.. raw:: html\n\n   <ul>\n' + difflog + '   </ul>\n\n|\n\n')
+if not PER_RELEASE:
+    write_if_changed('changelog.rst', page('Change Log', '.. raw:: html\n\n   <ul>\n' + difflog + '   </ul>\n\n|\n\n'))
+else:
+    written = [rr for rr in releases if write_if_changed('changelog/%s.rst' % names[rr],
+               page('Unreleased' if rr == 'unreleased' else 'CASA ' + rr, '.. raw:: html\n\n   <ul>\n' + releases[rr] + '   </ul>\n\n|\n\n'))]
+    write_if_changed('changelog.rst', page('Change Log', '.. toctree::\n   :maxdepth: 1\n\n' +
+                                           ''.join(['   changelog/%s\n' % names[rr] for rr in releases]) + '\n'))
+    print('changelog: %i release pages, %i written' % (len(releases), len(written)))
 
+# only keep the entries still in the changelog
+if (rendered > 0) or (len(entries) != len(cache)):
+    with open(CACHE_FILE, 'w') as fid:
+        json.dump(entries, fid, indent=1)
+print('changelog: %i entries, %i rendered' % (len(entries), rendered))
@@ -1,11 +1,23 @@
 import xml.etree.ElementTree as ET
 import re
 import os
+import sys
+import api_rst
+import api_stubs
+from api_model import Param, Task
 
 ########################################################
 # this is meant to be run from the docs folder
 # if running manually, cd docs first
+#
+# with --rst the api pages (api/tt/<module>.<task>.rst) are written directly
+# rather than python stubs for automodsumm and autodoc to import
+#
+# with --rst --only <task>[,<task>...] just those pages are written again and
+# the rest are left alone (scripts/watch_docs.py)
 ########################################################
+DIRECT = '--rst' in sys.argv
+ONLY = sys.argv[sys.argv.index('--only') + 1].split(',') if '--only' in sys.argv else None
 
 
 ################################################################
@@ -19,19 +31,18 @@ def parse_xml(xmlstring):
     nps = xmlroot.tag[:xmlroot.tag.rindex('}') + 1]
     troot = xmlroot.find(nps + 'task')  # xml root of the task
 
-    # initialize task dictionary (td)
-    td = {'name': troot.attrib['name'], 'category': troot.attrib['category'].split(',')[0].split('/')[0].split(' ')[0]}
-    td.update(dict([(ee.tag.replace(nps, ''), ee.text) for ee in list(troot) if ee.tag not in [nps + 'params']]))
+    # initialize task (td)
+    info = dict([(ee.tag.replace(nps, ''), ee.text) for ee in list(troot)])
+    td = Task(name=troot.attrib['name'], category=troot.attrib['category'].split(',')[0].split('/')[0].split(' ')[0],
+              shortdescription=info.get('shortdescription'), description=info.get('description'), params={}, subparams={})
 
     # fix bad category
-    if td['category'] == 'import':
-        td['category'] = 'data'
+    if td.category == 'import':
+        td.category = 'data'
 
     # parameters
     if troot.find(nps + 'input') is not None:
         iroot = troot.find(nps + 'input')
-        td['params'] = {}
-        td['subparams'] = {}
 
         for param in iroot.findall(nps + 'param'):
             pd = param.attrib
@@ -60,10 +71,12 @@ def parse_xml(xmlstring):
                     pd['value'] = '[' + pd['value'] + ']' if pd['value'] is not None else '\'\''  # '[\'\']'
                 elif ('vec' in pd['type'].split(',')[0].lower()) and (not pd['type'].startswith('[')):
                     pd['value'] = '[' + pd['value'] + ']' if pd['value'] is not None else '\'\''  # '[\'\']'
-            # store parameter dictionary under key equal to parameter name
-            td['params'][param.attrib['name']] = pd
+            # store parameter under its name
+            td.params[pd['name']] = Param(name=pd['name'], type=pd['type'], value=pd.get('value'), mustexist=pd.get('mustexist'),
+                                          subparam=pd.get('subparam', '').lower() == 'true', shortdescription=pd['shortdescription'],
+                                          description=pd['description'], link=True)
 
-        # subparameter constraints
+        # subparameter constraints, kept with the param they depend on
         if iroot.find(nps + 'constraints') is not None:
             for parent in list(iroot.find(nps + 'constraints')):
                 param = parent.attrib['param']
@@ -76,7 +89,7 @@ def parse_xml(xmlstring):
                         if sub.tag.replace(nps, '') == 'description': continue
                         cd[sub.attrib['param']] = ['' if ee.text is None else ee.text for ee in
                                                    sub.findall(nps + 'value')]
-                    td['subparams'][paramstr] = cd
+                    td.add_condition(param, paramstr, cd)
 
     return td
 ################################################################
@@ -131,136 +144,71 @@ for task in ['browsetable.xml', 'msuvbin.xml']:
 
 
 ####################################################################
-# now we have all the tasks in an array of dictionaries
+# now we have all the tasks in lists of Task objects (api_model.py)
 # for each one, create a python function stub,
 # write the parameters to docstring format
 # and marry up the Plone description page to the bottom
 
 
-########################################################
-# helper function to return a string of type and default value for a given parameter
-def ParamSpec(param):
-    pd = task['params'][param]
-    ptype = '{%s}' % pd['type'] if len(pd['type'].split(', ')) > 1 else pd['type']
-    proto = '%s_ (%s=\'\')' % (param, ptype)
-
-    # must exist params don't have default values
-    if ('mustexist' in pd) and (pd['mustexist'] == 'true'):
-        proto = '%s_ (%s)' % (param, ptype)
-    elif ('value' in pd) and (pd['value'] is not None):
-        if (('string' in pd['type'].split(', ')) or ('variant' in ptype)) and (not pd['value'].startswith('\'')):
-            proto = '%s_ (%s=\'%s\')' % (param, ptype, pd['value'].strip())
-        else:
-            proto = '%s_ (%s=%s)' % (param, ptype, pd['value'].strip())
-
-    return proto
-
-
 ########################################################
 def render_rst(component, category, text, task):
-    if not os.path.exists('../'+component+'/' + category):
-        os.system('mkdir ../'+component+'/' + category)
+    if DIRECT and (ONLY is not None) and (task.name not in ONLY):
+        return
 
     # change image links
     text = re.sub('(\.\. \|.*?\| image:: )_apimedia/(\S*)\s*?\n', r'\1../../tasks/_apimedia/\2\n', text, flags=re.DOTALL)
     text = re.sub('(\.\. figure:: )_apimedia/(\S*)\s*?\n', r'\1../../tasks/_apimedia/\2\n', text, flags=re.DOTALL)
 
-    # add this task to the __init__.py
-    with open('../'+component+'/' + category + '__init__.py', 'a') as fid:
-        fid.write('from .' + task['name'] + ' import *\n')
+    # build the function prototype, start with params that have no default
+    args = task.args()
+
+    # docstring, everything between the quotes of the stub, with the Plone content in the Notes section and
+    # the long description of each parameter at the bottom (api_stubs.TASK_DOC)
+    doc = api_stubs.task_doc(task, text)
+
+    module = component + ('.' + category.rstrip('/') if len(category) > 0 else '')
+    if DIRECT:
+        # the api page itself, and the first paragraph of the docstring for the module's summary table
+        lines = api_rst.docstring(doc)
+        api_rst.write_page(module + '.' + task.name, api_rst.function_page(module, task.name, args, lines))
+        api_rst.add_entry(index, module, [task.name, module + '.' + task.name, api_rst.summary(lines)])
+        return
+
+    if not os.path.exists('../'+component+'/' + category):
+        os.system('mkdir ../'+component+'/' + category)
+
+    # add this task to the __init__.py, written once all the tasks are done
+    inits.setdefault('../'+component+'/' + category + '__init__.py', []).append(task.name)
 
     # write the python stub function
-    with open('../'+component+'/' + category + task['name'] + '.py', 'w') as fid:
-        fid.write('#\n# stub function definition file for docstring parsing\n#\n\n')
-
-        # build the function prototype, start with params that have no default
-        proto = [pp for pp in task['params'] if ('mustexist' in task['params'][pp]) and (task['params'][pp]['mustexist'] == 'true')]
-        proto = (', '.join(proto) + ', ') if len(proto) > 0 else ''
-        for param in task['params'].keys():
-            # must exist params don't have default values
-            if ('mustexist' not in task['params'][param]) or (task['params'][param]['mustexist'] == 'false'):
-                proto += '%s%s, ' % (param, ParamSpec(param)[ParamSpec(param).rindex('='):-1])
-        proto = '%s(%s)' % (task['name'], proto[:-2])
-        fid.write('def ' + proto + ':\n    r"""\n')
-
-        # populate function description
-        if 'shortdescription' in task.keys():
-            fid.write(task['shortdescription'] + '\n\n')
-        elif 'description' in task.keys():
-            fid.write(re.sub('\s+', ' ', task['description'].strip(), flags=re.DOTALL) + '\n\n')
-        else:
-            fid.write(' \n\n')
-
-        # populate a horizontal toc nav bar
-        if len(text) > 0:  fid.write('[' + '] ['.join(['`%s`_' % section for section in ['Description', 'Examples', 'Development', 'Details']]) + ']\n\n')
-
-        # populate function parameters
-        fid.write('\nParameters\n')
-        for param in task['params'].keys():
-            # skip subparameters for now, they are handled below for each regular parameter
-            if ('subparam' in task['params'][param]) and (task['params'][param]['subparam'].lower() == 'true'):
-                continue
-
-            fid.write('   - %s' % ParamSpec(param))
-            if ('shortdescription' in task['params'][param].keys()) and (task['params'][param]['shortdescription'] is not None):
-                if len(task['params'][param]['shortdescription'].strip()) > 0:
-                    fid.write(' - %s' % task['params'][param]['shortdescription'])
-            fid.write('\n')
-
-            # populate function subparameters (if any)
-            subparmkeys = [ee for ee in task['subparams'].keys() if ee.startswith(param + ' =') or ee.startswith(param + ' !=')]
-            for paramstr in subparmkeys:
-                if len(task['subparams'][paramstr]) > 0:
-                    fid.write('\n      .. raw:: html\n\n         <details><summary><i> %s </i></summary>\n\n' % paramstr)
-                # grab each subparam from the main param section and write it out
-                for subparam in task['subparams'][paramstr].keys():
-                    if subparam not in task['params']: continue
-                    fid.write('      - %s' % ParamSpec(subparam))
-                    if ('shortdescription' in task['params'][subparam].keys()) and (task['params'][subparam]['shortdescription'] is not None):
-                        if len(task['params'][subparam]['shortdescription'].strip()) > 0:
-                            fid.write(' - %s' % task['params'][subparam]['shortdescription'])
-                    fid.write('\n')
-                if len(task['subparams'][paramstr]) > 0:
-                    fid.write('\n      .. raw:: html\n\n         </details>\n')
-
-        # marry up the Plone content to the bottom Notes section
-        fid.write('\n\n' + text + '\n\n')
-
-        # Add long descriptions of each parameter as footnotes at the bottom. For example:
-        # .. _paramname:
-        # 
-        # | ``paramname (paramtype=defaultvalue)`` - description line 1
-        # |    description line 2...
-        fid.write('.. _Details:\n\n')
-        fid.write('\nParameter Details\n   Detailed descriptions of each function parameter\n\n')
-        for pname,pval in task['params'].items():
-            if ('description' in pval.keys()) and (pval['description'] is not None):
-                fid.write('.. _%s:\n\n' % pname)
-                fid.write('| ``%s`` - ' % ParamSpec(pname).replace('_ ', ' '))
-                fid.write('%s\n\n' % re.sub('\n+', '\n|    ', pval['description'].strip(), flags=re.DOTALL))
-
-        # close docstring stub
-        fid.write('\n    """\n    pass\n')
+    api_stubs.write('../'+component+'/' + category + task.name + '.py', api_stubs.task_stub(task.name, args, doc))
 
     return
 
 
 ##################################################################################
 
+# pages left from the other mode would be stale, automodsumm doesn't overwrite them
+index, inits = {}, {}
+if DIRECT and (ONLY is not None):
+    index = api_rst.read_index('tasks')
+elif DIRECT or os.path.exists(api_rst.TT + '_tasks.json'):
+    api_rst.clean(['casatasks', 'almatasks', 'casaplotms', 'casaviewer', 'casalith'], 'tasks')
+
 # render casatasks, almatasks, casaplotms, and casaviewer
 for mname, mlist in [('casatasks', tasklist), ('almatasks', almalist), ('casaplotms', plotmslist), ('casaviewer', viewerlist)]:
     tasknames = []
     for task in mlist:
         # grab rst description page if it exists, otherwise skip this task
         rst = ''
-        if os.path.exists('tasks/task_' + task['name'] + '.rst'):
-            tasknames += [task['name']]
-            with open('tasks/task_' + task['name'] + '.rst', 'r') as fid:
+        if os.path.exists('tasks/task_' + task.name + '.rst'):
+            tasknames += [task.name]
+            with open('tasks/task_' + task.name + '.rst', 'r') as fid:
                 rst = fid.read()
         else:
             continue
 
-        category = task['category']+'/' if mname == 'casatasks' else ''
+        category = task.category+'/' if mname == 'casatasks' else ''
         render_rst(mname, category, rst, task)
 
 
@@ -270,10 +218,15 @@ for mname, mlist in [('casatasks', tasklist), ('almatasks', almalist), ('casaplo
 tasknames = []
 for task in lithlist:
     rst = ''
-    if os.path.exists('tasks/task_' + task['name'] + '.rst'):
-        tasknames += [task['name']]
-        with open('tasks/task_' + task['name'] + '.rst', 'r') as fid:
+    if os.path.exists('tasks/task_' + task.name + '.rst'):
+        tasknames += [task.name]
+        with open('tasks/task_' + task.name + '.rst', 'r') as fid:
             rst = fid.read()
     else:
         continue
     render_rst('casalith', '', rst, task)
+
+if DIRECT:
+    api_rst.write_index('tasks', index)
+for fname, names in inits.items():
+    api_stubs.write(fname, api_stubs.init(names))
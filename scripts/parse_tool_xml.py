@@ -1,12 +1,28 @@
 import xml.etree.ElementTree as ET
 import re
 import os
+import sys
 import pypandoc
+import api_rst
+import api_stubs
+from api_model import Method, Param, Tool
 
 ########################################################
 # this is meant to be run from the docs folder
 # if running manually, cd docs first
+#
+# with --rst the api pages (api/tt/casatools.<tool>.rst) are written directly
+# rather than python stubs for automodsumm and autodoc to import
+#
+# with --rst --method-pages N, tools with N or more methods get a summary page
+# and a page for each method (api/tt/casatools.<tool>.<tool>.<method>.rst)
+#
+# with --rst --only <tool>[,<tool>...] just those pages are written again and
+# the rest are left alone (scripts/watch_docs.py)
 ########################################################
+DIRECT = '--rst' in sys.argv
+METHOD_PAGES = int(sys.argv[sys.argv.index('--method-pages') + 1]) if '--method-pages' in sys.argv else 0
+ONLY = sys.argv[sys.argv.index('--only') + 1].split(',') if '--only' in sys.argv else None
 
 pypandoc.pandoc_download.download_pandoc(version='2.10.1')
 
@@ -33,17 +49,15 @@ for tool in tools:
     nps = xmlroot.tag[:xmlroot.tag.rindex('}') + 1]
     troot = xmlroot.find(nps + 'tool')  # xml root of the task
 
-    # initialize tool dictionary (td)
-    td = [(ee.tag.replace(nps, ''), ee.text) for ee in list(troot) if ee.tag not in [nps + 'method', nps + 'code']]
-    td = dict([(ee[0], '' if ee[1] is None else ee[1]) for ee in td])
-    td['methods'] = {}
+    # initialize tool (td)
+    info = dict([(ee.tag.replace(nps, ''), '' if ee.text is None else ee.text) for ee in list(troot)])
+    td = Tool(name=troot.attrib['name'], shortdescription=info.get('shortdescription', ''), description=info.get('description', ''), methods={})
 
     # loop over each method
     for method in troot.findall(nps + 'method'):
-        md = dict([(ee.tag.replace(nps, ''), ee.text) for ee in list(method) if ee.tag not in [nps + 'input']])
-        md['params'] = {}
-        md['returns'] = None
-        md['examples'] = None
+        info = dict([(ee.tag.replace(nps, ''), ee.text) for ee in list(method)])
+        md = Method(name=method.attrib['name'], shortdescription=info.get('shortdescription'), description=info.get('description'),
+                    params={}, returns=None, examples=None)
 
         # build parameter dictionary
         if method.find(nps + 'input') is not None:
@@ -88,21 +102,22 @@ for tool in tools:
                     if (pd['type'] == 'record') and (pd['value'] is not None) and (not pd['value'].startswith('\'')):
                         pd['value'] = '\'' + pd['value'] + '\''
 
-                # store parameter dictionary under key equal to parameter name
-                md['params'][param.attrib['name']] = pd
+                # store parameter under its name
+                md.params[pd['name']] = Param(name=pd['name'], type=pd['type'], value=pd.get('value'), mustexist=pd.get('mustexist'),
+                                              subparam=False, shortdescription=pd['shortdescription'], description=pd['description'], link=False)
 
         # get the return value of this method
         if method.find(nps + 'returns') is not None:
             iroot = method.find(nps + 'returns')
-            md['returns'] = iroot.attrib['type'] if 'type' in iroot.attrib else None
+            md.returns = iroot.attrib['type'] if 'type' in iroot.attrib else None
 
         # get anything in the example section for this method
         if method.find(nps + 'example') is not None:
             iroot = method.find(nps + 'example')
-            md['examples'] = iroot.text
+            md.examples = iroot.text
 
-        td['methods'][method.attrib['name']] = md
-    tooldict[troot.attrib['name']] = td
+        td.methods[md.name] = md
+    tooldict[td.name] = td
 
 # limit the tools to the ones we want to process
 tools_to_exclude = []
@@ -124,28 +139,11 @@ if not os.path.exists('../casatools'):
     os.system('mkdir ../casatools')
 
 ####################################################################
-# now we have all the tasks in an array of dictionaries
+# now we have all the tools in a dict of Tool objects (api_model.py)
 # for each one, create a python function stub,
 # write the parameters to docstring format
 # and marry up the Plone description page to the bottom
 
-# helper function to return a string of type and default value for a given parameter
-def ParamSpec(method, param):
-    pd = tool['methods'][method]['params'][param]
-    ptype = '{%s}' % pd['type'] if len(pd['type'].split(', ')) > 1 else pd['type']
-    proto = '%s (%s=\'\')' % (param, ptype)
-
-    # must exist params don't have default values
-    if ('mustexist' in pd) and (pd['mustexist'] == 'true'):
-        proto = '%s (%s)' % (param, ptype)
-    elif ('value' in pd) and (pd['value'] is not None):
-        if (('string' in pd['type'].split(', ')) or ('variant' in ptype)) and (not pd['value'].startswith('\'')):
-            proto = '%s (%s=\'%s\')' % (param, ptype, pd['value'].strip())
-        else:
-            proto = '%s (%s=%s)' % (param, ptype, pd['value'].strip())
-    return proto
-
-
 # remove weird formatting issues in the xml descriptions
 # separate first line from rest for using the dropdown expander
 def cleanxml(text, block=False):
@@ -163,16 +161,31 @@ def cleanxml(text, block=False):
 def tool_rst_exists(name):
     return os.path.exists('tools/tool_' + name + '.rst')
 
+# first line of the class docstring, also the tool's summary in the tool listing
+def tool_summary(name):
+    tool = tooldict[name]
+    return cleanxml(tool.shortdescription) if len(tool.shortdescription.strip()) > 0 else name + ' class'
+
 # include tools in the __init__.py
 tools_to_init  = [name for name in tooldict.keys()  if tool_rst_exists(name)]
 tools_to_init += [name for name in tools_to_exclude if tool_rst_exists(name)]
-with open('../casatools/' + '__init__.py', 'a') as fid:
-    for name in tools_to_init:
-        fid.write('from .' + name + ' import *\n')
+if not DIRECT:
+    api_stubs.write('../casatools/' + '__init__.py', api_stubs.init(tools_to_init))
+
+# pages left from the other mode would be stale, automodsumm doesn't overwrite them
+index = {}
+if DIRECT and (ONLY is not None):
+    index = api_rst.read_index('tools')
+    for name in ONLY:
+        api_rst.remove('casatools.' + name)
+elif DIRECT:
+    api_rst.clean(['casatools'], 'tools', keep=['casatools.%s.' % name for name in tools_to_exclude])
+elif os.path.exists(api_rst.TT + '_tools.json'):
+    api_rst.clean(['casatools'], 'tools')
 
 toolnames = []
 for name in tooldict.keys():
-    if name in tools_to_exclude:
+    if (name in tools_to_exclude) or (DIRECT and (ONLY is not None) and (name not in ONLY)):
         print(f"({name})")
         continue
     print(name)
@@ -189,91 +202,79 @@ for name in tooldict.keys():
     rst = re.sub('(\.\. \|.*?\| image:: )_apimedia/(\S*)\s*?\n', r'\1../../tools/_apimedia/\2\n', rst, flags=re.DOTALL)
     rst = re.sub('(\.\. figure:: )_apimedia/(\S*)\s*?\n', r'\1../../tools/_apimedia/\2\n', rst, flags=re.DOTALL)
 
-    # start output string to write new stub class
-    ostr = '#\n# stub class definition file for docstring parsing\n#\n\n'
-    ostr += 'class %s:\n    r"""\n' % name
+    # class docstring, everything between the quotes of the stub
+    summary = tool_summary(name)
 
     # populate class description
-    if ('shortdescription' in tool.keys()) and (tool['shortdescription'] is not None) and (len(tool['shortdescription'].strip()) > 0):
-        ostr += ' '*4 + cleanxml(tool['shortdescription']).replace('\n', '\n' + ' ' * 4) + '\n\n'
-    else:
-        ostr += ' '*4 + tool + ' class\n\n'
-
-    if ('description' in tool.keys()) and (tool['description'] is not None) and (len(tool['description'].strip()) > 0):
+    desc = None
+    if len(tool.description.strip()) > 0:
         #desc = pypandoc.convert_text(tool['description'].replace('_', '\_').replace(r'\\_', '\_'), 'rst', format='latex', extra_args=['--wrap=none'])
         try:
             fromformat = 'latex' if name not in rst_tools else 'rst'
-            desc = pypandoc.convert_text(re.sub('(\s\w*?)\_(\w*?)', r'\1\_\2', tool['description'], flags=re.DOTALL), 'rst', format=fromformat, extra_args=['--wrap=none'])
+            desc = pypandoc.convert_text(re.sub('(\s\w*?)\_(\w*?)', r'\1\_\2', tool.description, flags=re.DOTALL), 'rst', format=fromformat, extra_args=['--wrap=none'])
         except:
-            desc = tool['description']
+            desc = tool.description
         #desc = re.sub('(\s\\\\w*?)\_(\w*?)', r'\1_\2', tool['description'].replace('_', '\_'), flags=re.DOTALL)
         #desc = pypandoc.convert_text(desc, 'rst', format='latex', extra_args=['--wrap=none'])
-        ostr += ' ' * 4 + desc.replace('\n', '\n' + ' ' * 4) + '\n\n'
-    ostr += ' ' * 4 + '"""\n\n'
+    cdoc = api_stubs.class_doc(summary, desc)
+    methods = []
 
     # build the class definition
-    for method in tool['methods'].keys():
+    for tm in tool.methods.values():
+        method = tm.name
         toolnames += [name + '.' + method]
-        # build method stub, start with params that have no default
-        tm = tool['methods'][method]
 
         # create a method description
         desc = ' ' * 8 + method + ' method\n\n'
-        if ('description' in tm.keys()) and (tm['description'] is not None) and (len(tm['description'].strip()) > 0):
+        if (tm.description is not None) and (len(tm.description.strip()) > 0):
             try:
                 # desc = ' ' * 8 + pypandoc.convert_text(tm['description'].replace('_', '\_').replace(r'\\_', '\_'), 'rst', format='latex', extra_args=['--wrap=none']).replace('\n', '\n' + ' ' * 8) + '\n\n'
-                desc = ' ' * 8 + pypandoc.convert_text(re.sub('(\s\w*?)\_(\w*?)', r'\1\_\2', tm['description'], flags=re.DOTALL).replace('\\\\','\\'), 'rst', format='latex', extra_args=['--wrap=none']).replace('\n', '\n' + ' ' * 8) + '\n\n'
+                desc = ' ' * 8 + pypandoc.convert_text(re.sub('(\s\w*?)\_(\w*?)', r'\1\_\2', tm.description, flags=re.DOTALL).replace('\\\\','\\'), 'rst', format='latex', extra_args=['--wrap=none']).replace('\n', '\n' + ' ' * 8) + '\n\n'
             except:
                 # desc = ' ' * 8 + pypandoc.convert_text(tm['description'], 'rst', format='markdown', extra_args=['--wrap=none']).replace('\n', '\n' + ' ' * 8) + '\n\n'
-                desc = ' ' * 8 + tm['description'].replace('\n', '\n' + ' ' * 8) + '\n\n'
-        elif ('shortdescription' in tm.keys()) and (tm['shortdescription'] is not None) and (len(tm['shortdescription'].strip()) > 0):
-            desc = ' ' * 8 + cleanxml(tm['shortdescription']).replace('\n', '\n' + ' ' * 8) + '\n\n' + ' ' * 8 + '\n\n'
+                desc = ' ' * 8 + tm.description.replace('\n', '\n' + ' ' * 8) + '\n\n'
+        elif (tm.shortdescription is not None) and (len(tm.shortdescription.strip()) > 0):
+            desc = ' ' * 8 + cleanxml(tm.shortdescription).replace('\n', '\n' + ' ' * 8) + '\n\n' + ' ' * 8 + '\n\n'
 
         # some methods have no parameters
-        if ('params' not in tm.keys()) or (len(tm['params']) == 0):
-            ostr += '    def %s(self):\n        r"""\n%s\n\n        """\n\n        pass\n\n' % (method, desc)
+        if len(tm.params) == 0:
+            methods += [(method, '', api_stubs.method_doc(desc, None), False)]
             continue
 
-        proto = [pp for pp in tm['params'] if ('mustexist' in tm['params'][pp]) and (tm['params'][pp]['mustexist'] == 'true')]
-        proto = ', '.join(proto) + ', ' if len(proto) > 0 else ''
-        for param in tm['params'].keys():
-            # must exist params don't have default values
-            if ('mustexist' not in tm['params'][param]) or (tm['params'][param]['mustexist'] == 'false'):
-                proto += '%s%s, ' % (param, ParamSpec(method, param)[ParamSpec(method, param).rindex('='):-1])
-
-        # populate method protoype and description
-        ostr += '    def %s(self, %s):\n        r"""\n%s\n\n' % (method, proto[:-2], desc)
-
-        # populate method parameters
-        ostr += ' ' * 8 + '.. rubric:: Parameters\n\n'
-        for param in tm['params'].keys():
-            ostr += ' ' * 8 + '- ``%s``' % ParamSpec(method, param)
-            if ('description' in tm['params'][param].keys()) and (tm['params'][param]['description'] is not None) and (
-                    len(tm['params'][param]['description'].strip()) > 0):
-                ostr += ' - %s' % cleanxml(tm['params'][param]['description']).replace('\n', '  ')
-            elif ('shortdescription' in tm['params'][param].keys()) and (
-                    tm['params'][param]['shortdescription'] is not None):
-                if len(tm['params'][param]['shortdescription'].strip()) > 0:
-                    ostr += ' - %s' % cleanxml(tm['params'][param]['shortdescription']).replace('\n', '  ')
-            ostr += '\n'
-
-        # populate method Returns
-        if (tm['returns'] is not None) and (len(str(tm['returns']).strip()) > 0):
-            ostr += '\n\n' + ' '*8 + '.. rubric:: Returns\n\n'
-            ostr += ' ' * 8 + '``%s``\n\n' % str(tm['returns'])
-
-        # populate method Examples
-        if (tm['examples'] is not None) and (len(str(tm['examples']).strip()) > 0):
-            ostr += ' '*8 + '.. rubric:: Examples\n\n'
-            ostr += ' '*8 + '::\n\n'
-            ostr += ' ' * 11 + tm['examples'].replace('\n', '\n' + ' ' * 11)
-
-        # close docstring stub
-        ostr += '\n' + ' ' * 8 + '"""\n\n' + ' ' * 8 + 'pass\n\n\n'
+        # populate method parameters, each with its description (or short description)
+        params = []
+        for param in tm.params.values():
+            if (param.description is not None) and (len(param.description.strip()) > 0):
+                params += [(param.spec, cleanxml(param.description).replace('\n', '  '))]
+            elif (param.shortdescription is not None) and (len(param.shortdescription.strip()) > 0):
+                params += [(param.spec, cleanxml(param.shortdescription).replace('\n', '  '))]
+            else:
+                params += [(param.spec, None)]
+
+        # method prototype and docstring, with the Returns and Examples if there are any
+        returns = str(tm.returns) if (tm.returns is not None) and (len(str(tm.returns).strip()) > 0) else None
+        examples = tm.examples if (tm.examples is not None) and (len(str(tm.examples).strip()) > 0) else None
+        methods += [(method, tm.args(), api_stubs.method_doc(desc, params, returns, examples), True)]
 
     # marry up the Plone content to the bottom Notes section
     # fid.write('\n\n    """' + rst + '\n\n    """')
 
+    if DIRECT:
+        # the api page with the class and all its methods, and the first paragraph of each docstring for the summary tables
+        lines = api_rst.docstring(cdoc)
+        methods = [(method, args, api_rst.docstring(mdoc)) for method, args, mdoc, params in sorted(methods)]
+        pages = (METHOD_PAGES > 0) and (len(methods) >= METHOD_PAGES)
+        api_rst.write_page('casatools.' + name, api_rst.class_page('casatools', name, lines, methods, pages))
+        for method, args, mlines in (methods if pages else []):
+            api_rst.write_page('casatools.%s.%s.%s' % (name, name, method), api_rst.method_page('casatools', name, method, args, mlines))
+        index['casatools.' + name] = [[method, 'casatools.%s.%s.%s' % (name, name, method), api_rst.summary(mlines)] for method, args, mlines in methods]
+        continue
+
     # write the python stub class
-    with open('../casatools/' + name + '.py', 'w') as fid:
-        fid.write(ostr)
+    api_stubs.write('../casatools/' + name + '.py', api_stubs.tool_stub(name, cdoc, methods))
+
+# the tool listing, its summaries are the first paragraph of each class docstring (the short description)
+if DIRECT:
+    index['casatools'] = [[name, 'casatools.' + name, api_rst.summary(api_rst.docstring('\n    ' + tool_summary(name).replace('\n', '\n    ')))]
+                          for name in sorted(set(tools_to_init))]
+    api_rst.write_index('tools', index)
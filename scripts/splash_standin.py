@@ -0,0 +1,156 @@
+##################################################################################
+# local stand-in for the casadocs plone site and the splash render service
+# previously scraped pages in the html folder are served under their original
+# url paths, and splash render requests are answered by fetching the page back
+# from this same server after a configurable delay
+#
+# this lets the scraper be exercised offline, for example:
+#   python scripts/splash_standin.py --port 8050 --sitemap standin_sitemap.txt
+#   scrapy crawl full -s SPLASH_URL=http://localhost:8050/ -s SITEMAP_FILE=standin_sitemap.txt -s RENDER_MODE=auto
+#
+# --capacity, --jitter and --error-rate make the render service behave like an overloaded splash,
+# for trying out the crawl concurrency settings (ADAPTIVE_CONCURRENCY):
+#   python scripts/splash_standin.py --latency 0.5 --capacity 4 --error-rate 0.02
+#
+# note that the full spider clears the page store when it starts, so serve a copy of it with --site
+# (either an html folder or an html.sqlite file, see scraper/pagestore.py)
+##################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper.pagestore import open_store
+
+parser = argparse.ArgumentParser(description='stand-in casadocs site and splash server')
+parser.add_argument('--port', type=int, default=8050, help='port to listen on')
+parser.add_argument('--site', default='html', help='page store of scraped pages to serve as the site')
+parser.add_argument('--latency', type=float, default=0.0, help='extra seconds added to every render request')
+parser.add_argument('--jitter', type=float, default=0.0, help='random extra seconds, up to this much, added to every render')
+parser.add_argument('--capacity', type=int, default=0, help='renders that can run at once, more wait their turn (0 is unlimited)')
+parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of render requests answered with a 503')
+parser.add_argument('--sitemap', default=None, help='write a copy of the sitemap of the --site store, pointing at this server, to this file')
+args = parser.parse_args()
+
+store = open_store(args.site)
+counts = {'site': 0, 'not_modified': 0, 'render.html': 0, 'execute': 0, 'missing': 0, 'errors': 0, 'active': 0, 'peak': 0}
+lock = threading.Lock()
+
+# url -> (etag, time) of the page as last served, the time moves on when the page in the store changes
+versions = {}
+renders = threading.BoundedSemaphore(args.capacity) if args.capacity > 0 else None
+
+
+def count(key, step=1):
+    with lock:
+        counts[key] += step
+        counts['peak'] = max(counts['peak'], counts['active'])
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    # scrapy keeps its connections open, every reply has a Content-Length so keep-alive works
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, code, body, ctype='text/html; charset=utf-8', headers={}):
+        body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # site pages are stored under their original casadocs url
+    # they come with an ETag and Last-Modified, and conditional requests are answered with a 304
+    # while the page is the same, like the real site does for the incremental crawl (INCREMENTAL_CRAWL)
+    def serve_page(self, path):
+        url = 'https://casa.nrao.edu' + path.rstrip('/')
+        body = store.get(url)
+        if body is None:
+            count('missing')
+            return self.reply(404, '<html><body>not found</body></html>')
+        etag = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+        with lock:
+            if versions.get(url, (None,))[0] != etag:
+                versions[url] = (etag, int(time.time()))
+            modified = versions[url][1]
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True)}
+        if self.headers.get('If-None-Match') is not None:
+            unchanged = etag in [tt.strip() for tt in self.headers['If-None-Match'].split(',')]
+        else:
+            try:
+                unchanged = modified <= parsedate_to_datetime(self.headers.get('If-Modified-Since')).timestamp()
+            except (TypeError, ValueError):
+                unchanged = False
+        if unchanged:
+            count('not_modified')
+            return self.reply(304, '', headers=headers)
+        count('site')
+        self.reply(200, '<html><body>%s</body></html>' % body, headers=headers)
+
+    # splash takes its arguments from the query string or from a json body
+    # the execute endpoint doesn't run the lua script, it answers the way the adaptive render script does
+    def render(self, endpoint, params):
+        count(endpoint)
+        if random.random() < args.error_rate:
+            count('errors')
+            return self.reply(503, json.dumps({'error': 503, 'description': 'overloaded'}), 'application/json')
+        start = time.time()
+        if renders is not None:
+            renders.acquire()
+        count('active')
+        try:
+            time.sleep(args.latency + random.uniform(0, args.jitter) + float(params.get('wait', 0)))
+            with urllib.request.urlopen(params['url']) as page:
+                html = page.read().decode('utf-8')
+        except Exception as err:
+            return self.reply(502, json.dumps({'error': 502, 'description': str(err)}), 'application/json')
+        finally:
+            count('active', -1)
+            if renders is not None:
+                renders.release()
+        if endpoint == 'execute':
+            result = {'html': html, 'url': params['url'], 'ready': True, 'waited': 0, 'render_time': time.time() - start}
+            return self.reply(200, json.dumps(result), 'application/json')
+        return self.reply(200, html)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == '/_stats':
+            return self.reply(200, json.dumps(counts), 'application/json')
+        if url.path == '/render.html':
+            return self.render('render.html', dict(urllib.parse.parse_qsl(url.query)))
+        return self.serve_page(url.path)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or '{}')
+        if url.path in ['/render.html', '/execute']:
+            return self.render(url.path[1:], params)
+        return self.reply(404, json.dumps({'error': 404}), 'application/json')
+
+
+# the sitemap the store was scraped with, or the one in the scraper folder if the store doesn't have it
+if args.sitemap is not None:
+    urls = store.order()
+    if len(urls) == 0:
+        with open('scraper/_sitemap.txt') as fid:
+            urls = fid.read().splitlines()
+    with open(args.sitemap, 'w') as fid:
+        fid.write('\n'.join([uu.replace('https://casa.nrao.edu', 'http://localhost:%i' % args.port) for uu in urls]))
+
+# the default listen backlog of 5 drops connections once the crawl concurrency goes past it
+ThreadingHTTPServer.request_queue_size = 128
+print('serving %s and splash endpoints on port %i' % (args.site, args.port))
+ThreadingHTTPServer(('', args.port), StandinHandler).serve_forever()
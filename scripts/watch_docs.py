@@ -0,0 +1,183 @@
+##################################################################################
+# rebuild the docs as they are edited and serve them with auto-reload
+#
+# this is meant to be run from the docs folder (buildme.sh --watch)
+#
+#   python ../scripts/watch_docs.py [--port 8000] [--xml devdir]
+#
+# sphinx is started once (running conf.py and the generation scripts as usual)
+# and kept in this process, then the sources are watched with inotify:
+#   notebooks/*.ipynb, api/*.rst, *.rst    - incremental sphinx build
+#   tasks/task_<name>.rst, task xml        - parse_task_xml.py --rst --only <name>, then sphinx
+#   tools/tool_<name>.rst, tool xml        - parse_tool_xml.py --rst --only <name>, then sphinx
+# with --xml, the task and tool xml of a casa dev tree is watched as well and
+# copied in to casasource when it changes (like buildme.sh --copyxml)
+#
+# each build only reads and writes the pages that changed, and open pages of the
+# preview server reload themselves when a build finishes
+##################################################################################
+
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from sphinx.application import Sphinx
+
+PORT = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 8000
+DEVDIR = sys.argv[sys.argv.index('--xml') + 1] if '--xml' in sys.argv else None
+BUILD = 'build'
+
+# (folder, kind) pairs to watch, kind says what a changed file in it needs
+WATCH = [('.', 'sphinx'), ('api', 'sphinx'), ('notebooks', 'sphinx'), ('tasks', 'task'), ('tools', 'tool'),
+         ('../casasource/casa6/casatasks/xml', 'task'), ('../casasource/almatasks', 'task'),
+         ('../casasource/casaplotms', 'task'), ('../casasource/casaviewer', 'task'),
+         ('../casasource/casa6/casatools/xml', 'tool')]
+if DEVDIR is not None:
+    WATCH += [(os.path.join(DEVDIR, 'src/casa6/casatasks/xml'), 'devtask'), (os.path.join(DEVDIR, 'src/casa6/casatools/xml'), 'devtool')]
+
+SUFFIXES = ('.rst', '.ipynb', '.xml')
+
+# inotify flags, from sys/inotify.h
+IN_CLOSE_WRITE, IN_MOVED_TO, IN_DELETE = 0x8, 0x80, 0x200
+
+
+def inotify_changes(folders):
+    # yields the set of changed files each time something is saved, a burst of
+    # events (an editor writing a backup then the file) is collected for 0.2s first
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(0)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    folders = dict([(libc.inotify_add_watch(fd, ff.encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE), ff) for ff in folders])
+    while True:
+        changed = set()
+        ready = select.select([fd], [], [])[0]
+        while ready:
+            data = os.read(fd, 65536)
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode()
+                offset += 16 + length
+                if wd in folders:
+                    changed.add(os.path.join(folders[wd], name))
+            ready = select.select([fd], [], [], 0.2)[0]
+        yield changed
+
+
+def polled_changes(folders):
+    # the same by comparing modification times, where there is no inotify
+    def scan():
+        return dict([(os.path.join(ff, fn), os.path.getmtime(os.path.join(ff, fn))) for ff in folders for fn in os.listdir(ff)])
+    seen = scan()
+    while True:
+        time.sleep(0.5)
+        now = scan()
+        changed = set([fn for fn in set(now) | set(seen) if now.get(fn) != seen.get(fn)])
+        seen = now
+        if len(changed) > 0:
+            yield changed
+
+
+def changes(folders):
+    try:
+        yield from inotify_changes(folders)
+    except (OSError, AttributeError, TypeError):
+        print('inotify not available, polling for changes')
+        yield from polled_changes(folders)
+
+
+##################################################################################
+# preview server, html pages get a script polling the build number and reloading when it moves on
+RELOAD = b'''<script>(function () { var seen = null; setInterval(function () {
+  fetch('/_build').then(function (r) { return r.text(); }).then(function (n) {
+    if ((seen !== null) && (n !== seen)) { location.reload(); } seen = n; }).catch(function () {}); }, 1000); })();</script>'''
+builds = [0]
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/_build':
+            return self.reply(str(builds[0]).encode(), 'text/plain')
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        if path.endswith('.html') and os.path.exists(path):
+            with open(path, 'rb') as fid:
+                return self.reply(fid.read().replace(b'</body>', RELOAD + b'</body>'), 'text/html')
+        return SimpleHTTPRequestHandler.do_GET(self)
+
+    def reply(self, body, ctype):
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+##################################################################################
+# what a changed file needs before sphinx sees it, returns the tasks and tools to write again
+def affected(changed):
+    kinds = dict([(os.path.normpath(ff), kk) for ff, kk in WATCH])
+    tasks, tools = set(), set()
+    for fname in changed:
+        kind = kinds.get(os.path.normpath(os.path.dirname(fname)))
+        name = os.path.splitext(os.path.basename(fname))[0]
+        if (kind is None) or (not fname.endswith(SUFFIXES)):
+            continue
+        if kind in ['devtask', 'devtool'] and os.path.exists(fname):
+            target = '../casasource/casa6/%s/xml/' % ('casatasks' if kind == 'devtask' else 'casatools')
+            shutil.copy2(fname, target)
+        if kind in ['task', 'devtask']:
+            tasks.add(name[len('task_'):] if name.startswith('task_') else name)
+        elif kind in ['tool', 'devtool']:
+            tools.add(name[len('tool_'):] if name.startswith('tool_') else name)
+    return tasks, tools
+
+
+def generate(script, names, args=()):
+    cmd = [sys.executable, '../scripts/' + script, '--rst', '--only', ','.join(sorted(names))] + list(args)
+    print(' '.join(cmd))
+    subprocess.run(cmd, stdout=subprocess.DEVNULL)
+
+
+app = Sphinx('.', '.', BUILD, os.path.join(BUILD, '.doctrees'), 'html')
+if 'apirst' not in app.extensions:
+    print('watching needs direct_api = True in conf.py, task and tool pages will not be written again')
+app.build()
+
+server = ThreadingHTTPServer(('localhost', PORT), functools.partial(PreviewHandler, directory=BUILD))
+threading.Thread(target=server.serve_forever, daemon=True).start()
+print('serving %s on http://localhost:%i/ , watching for changes (ctrl-c to stop)' % (BUILD, PORT))
+
+try:
+    for changed in changes([ff for ff, kk in WATCH if os.path.isdir(ff)]):
+        start = time.time()
+        tasks, tools = affected(changed)
+        if ('apirst' in app.extensions) and (len(tasks) > 0):
+            generate('parse_task_xml.py', tasks)
+        if ('apirst' in app.extensions) and (len(tools) > 0):
+            generate('parse_tool_xml.py', tools, ['--method-pages', str(app.config.tool_method_pages)])
+        try:
+            app.build()
+        except Exception as err:
+            print('build failed: %s' % err)
+            continue
+        builds[0] += 1
+        print('rebuilt in %.1fs' % (time.time() - start))
+except KeyboardInterrupt:
+    server.shutdown()